@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+checks that the metamarkdown filters and analysers run in linear time
+
+every filter and analyser is run on adversarial inputs (long runs of
+whitespace, empty lines, dashes, brackets) of size N and 2N; the run fails
+if the time grows by more than `--ratio` when doubling the size (about 2 for
+a linear, about 4 for a quadratic regex); the results are compared against
+the previous regexes (`LEGACY`, only on the small inputs, they are quadratic)
+
+USAGE
+
+    python3 benchmarks/bench_adversarial.py [--size N] [--ratio R]
+"""
+import os
+import re
+import sys
+import argparse
+from timeit import default_timer as timer
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import metamarkdown as mm
+
+
+LEGACY = {
+    "emdash":       lambda s: re.sub(r"[\s]*--[\s]*", "—", s),
+    "linecomments": lambda s: re.sub(r"^[\s]*//.*$", "", s, flags=re.MULTILINE),
+    "comments":     lambda s: re.sub(r"\s//.*$", "", s, flags=re.MULTILINE),
+    "definitions":  lambda s: "\n".join(re.findall(r"^\s*\[.*\]:.*$", s, re.MULTILINE)),
+    "references":   lambda s: re.findall(r"\[([\w]*)\]:([\w:\/\.-]*)\s", s),
+}
+
+CURRENT = {
+    "emdash":       lambda s: mm._replace_emdash(s, True),
+    "linecomments": lambda s: mm._removeLineComments(s, True),
+    "comments":     lambda s: mm._removeComments(s, True),
+    "definitions":  lambda s: mm._definitionsOnly(s, True),
+    "references":   lambda s: [tuple(r) for r in mm._extract_references(s)["references"]],
+}
+
+INPUTS = {
+    "spaces":       lambda n: "a" + " " * n + "b",
+    "newlines":     lambda n: "a" + "\n" * n + "b",
+    "mixed ws":     lambda n: "a" + " \t\n" * (n//3) + "b",
+    "dashes":       lambda n: "-" * n,
+    "slashes":      lambda n: "/" * n,
+    "brackets":     lambda n: "[" * n + "]",
+    "definitions":  lambda n: "[a]:" * (n//4),
+    "ws dashes":    lambda n: (" " * 100 + "-") * (n//101),
+}
+
+def bench(func, s):
+    """
+    returns the best of three run times in milliseconds
+    """
+    best = None
+    for _ in range(3):
+        start = timer()
+        func(s)
+        t = timer()-start
+        best = t if best is None else min(best, t)
+    return best * 1e3
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="adversarial input benchmark")
+    ap.add_argument("--size", type=int, default=200000, help="size of the inputs")
+    ap.add_argument("--ratio", type=float, default=3.0, help="maximum time ratio for doubling the size")
+    args = ap.parse_args()
+
+    failed = []
+    for iname, gen in INPUTS.items():
+        small = gen(2000)
+        for fname, func in CURRENT.items():
+            assert LEGACY[fname](small) == func(small), (fname, iname)
+            t1 = bench(func, gen(args.size))
+            t2 = bench(func, gen(2*args.size))
+            ratio = t2/t1 if t1 > 0.05 else 1.0
+                # below 50us the timer noise dominates
+            ok = ratio <= args.ratio
+            if not ok: failed.append((fname, iname))
+            print("{:<13} {:<12} N {:8.2f}ms   2N {:8.2f}ms   ratio {:5.1f} {}".format(
+                        fname, iname, t1, t2, ratio, "" if ok else "FAILED"))
+    if failed:
+        print("superlinear:", ", ".join("{} on {}".format(*f) for f in failed))
+        sys.exit(1)
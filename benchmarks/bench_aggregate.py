@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+benchmarks the aggregation of the per-file meta data
+
+compares the previous aggregation loop of `readAndProcessInputFiles` (a deep
+copy of every record, and `full_meta = contract([meta, full_meta])`, which
+rebuilds the aggregate for every file) against the current one (shallow
+record copies, and `contract.applyUnder`), on generated meta data records
+that look like those of real files (body, analysis, filtered fields); each
+file also has `--unique` fields of its own, so the aggregate grows with the
+number of files
+
+USAGE
+
+    python3 benchmarks/bench_aggregate.py [--files N] [--unique N]
+"""
+import io
+import os
+import sys
+import argparse
+from copy import copy, deepcopy
+from collections import OrderedDict
+from timeit import default_timer as timer
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import metamarkdown as mm
+import pagebuilder as pb
+from transformer import contract
+
+
+SETTINGS_REFERENCES = tuple(
+    mm._Reference("link{}".format(i), "https://www.example.com/page{}".format(i)) for i in range(20)
+)
+
+def record(i, unique=1):
+    """
+    the meta data record of the `i`-th file (as returned by the builder)
+    """
+    meta = OrderedDict([
+        ("title",           "Document {}".format(i)),
+        ("heading",         "Heading {}".format(i)),
+        ("author",          "Benchmark"),
+        ("tags",            ("lorem", "ipsum", "tag{}".format(i%17))),
+        ("_meta",           OrderedDict([("author", "Benchmark"), ("version", str(i%5))])),
+        ("summary|md",      "<div class='ff ff-md ff-summary'><p>Summary of {}</p></div>".format(i)),
+        ("summary",         "Summary of {}".format(i)),
+        ("summary_html",    "<div class='ff ff-md ff-summary'><p>Summary of {}</p></div>".format(i)),
+        ("data|dct",        OrderedDict([("key1", "value {}".format(i)), ("key2", "value 2")])),
+        ("data",            "key1 => value {},\nkey2 => value 2".format(i)),
+    ])
+    for u in range(unique):
+        meta["note{}_{}".format(i, u)] = "note {} of document {}".format(u, i)
+    meta["_filename"] = "{:05d}_document.md".format(i)
+    meta["_filenamebase"] = "{:05d}_document".format(i)
+    meta["_body"] = "Lorem ipsum dolor sit amet, consectetur adipiscing elit.\n" * 70
+    meta["_analysis"] = {"references": SETTINGS_REFERENCES + (mm._Reference("own", "https://own/{}".format(i)),)}
+    return meta
+
+def legacy(results):
+    """
+    the previous aggregation loop
+    """
+    metaList, metaRawList, fullMeta = [], [], {}
+    for meta, metaRaw in results:
+        metaList.append(deepcopy(meta))
+        metaRawList.append(deepcopy(metaRaw))
+        fullMeta = contract([meta, fullMeta])
+    return metaList, metaRawList, fullMeta
+
+def current(results):
+    """
+    the current aggregation loop
+    """
+    metaList, metaRawList, fullMeta = [], [], {}
+    for meta, metaRaw in results:
+        metaList.append(copy(meta))
+        metaRawList.append(copy(metaRaw))
+        contract.applyUnder(meta, fullMeta)
+    return metaList, metaRawList, fullMeta
+
+def yamlText(data, **kwargs):
+    """
+    the YAML written for `data`
+    """
+    f = io.StringIO()
+    pb._writeYAML(f, data, **kwargs)
+    return f.getvalue()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="meta data aggregation benchmark")
+    ap.add_argument("--files", type=int, default=10000, help="number of files")
+    ap.add_argument("--unique", type=int, default=1, help="number of fields only present in one file")
+    args = ap.parse_args()
+
+    results = []
+    for i in range(args.files):
+        meta = record(i, args.unique)
+        results.append((meta, OrderedDict((k, v) for k, v in meta.items() if not k.startswith("_"))))
+
+    start = timer()
+    before = legacy(results)
+    t1 = timer()-start
+    start = timer()
+    after = current(results)
+    t2 = timer()-start
+
+    assert before[0] == after[0] and before[1] == after[1] and before[2] == after[2]
+    assert yamlText(before[0][:100]) == yamlText(after[0][:100], records=True)
+    print("files {}, aggregate {} fields".format(args.files, len(after[2])))
+    print("before {:8.1f}ms   after {:8.1f}ms   speedup {:5.1f}x".format(t1*1e3, t2*1e3, t1/t2))
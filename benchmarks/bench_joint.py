@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+benchmarks the peak memory used for writing the joint document
+
+compares the in-memory joint document (`"\n".join` of all sections, then
+formatted into the page template) against the streaming writer, with the
+sections kept in memory and spilled to a temporary file
+
+USAGE
+
+    python3 benchmarks/bench_joint.py [--sections N] [--size KB]
+"""
+import os
+import sys
+import argparse
+import tempfile
+import tracemalloc
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import pagebuilder as pb
+
+
+def peak(func):
+    """
+    returns the peak memory (in MB) allocated while running `func`
+    """
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024 / 1024
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="joint document memory benchmark")
+    ap.add_argument("--sections", type=int, default=200, help="number of sections")
+    ap.add_argument("--size", type=int, default=250, help="size of each section in KB")
+    args = ap.parse_args()
+
+    main = pb.PageBuilderMain()
+    builder = pb.PageBuilder()
+    meta = {"title": "benchmark"}
+    section = "<p>" + "lorem ipsum " * (args.size * 1024 // 12) + "</p>"
+    total = args.sections * len(section) / 1024 / 1024
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.chdir(tmpdir)
+        sections = [section + str(i) for i in range(args.sections)]
+        spill = pb.SpillFile()
+        spilled = [spill.add(html) for html in sections]
+
+        def legacy():
+            main.createJointDocument(builder, sections, dict(meta, jointfilename="legacy.html"))
+        def streamed():
+            main.createJointDocument(builder, sections, dict(meta, jointfilename="streamed.html"), stream=True)
+        def spilledStream():
+            main.createJointDocument(builder, spilled, dict(meta, jointfilename="spilled.html"), stream=True)
+
+        print("sections: {} MB (held in memory before the measurement, except spilled)".format(round(total)))
+        for name, func in (("in memory", legacy), ("streamed", streamed), ("spilled", spilledStream)):
+            print("{:<10} peak {:8.1f} MB".format(name, peak(func)))
+        with open("legacy.html") as f1, open("streamed.html") as f2, open("spilled.html") as f3:
+            assert f1.read() == f2.read() == f3.read()
+        spill.close()
+        os.chdir(cwd)
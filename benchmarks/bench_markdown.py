@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+benchmarks the per-document markdown overhead
+
+compares `markdown.markdown()` (a new engine per call) against the reused
+engine of `metamarkdown.markdown_to_html`, for a small page (where the engine
+setup dominates) and a short `|md` field value
+
+USAGE
+
+    python3 benchmarks/bench_markdown.py [--docs N]
+"""
+import os
+import sys
+import argparse
+from timeit import default_timer as timer
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import markdown as mdwn
+import metamarkdown as mm
+
+
+SMALL_PAGE = """
+# Heading
+
+Lorem ipsum dolor sit amet, *consectetur* adipiscing elit. Sed
+tincidunt diam quam, eu luctus erat [hendrerit][link] vitae.
+
+- item one
+- item two
+
+[link]:https://www.example.com
+"""
+
+FIELD = "some **bold** text"
+
+def bench(convert, doc, docs):
+    """
+    returns the time per document in microseconds
+    """
+    start = timer()
+    for _ in range(docs):
+        convert(doc)
+    return (timer()-start) / docs * 1e6
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="markdown engine benchmark")
+    ap.add_argument("--docs", type=int, default=2000, help="number of documents converted")
+    args = ap.parse_args()
+
+    for name, doc in (("small page", SMALL_PAGE), ("md field", FIELD)):
+        assert mdwn.markdown(doc) == mm.markdown_to_html(doc)
+        before = bench(mdwn.markdown, doc, args.docs)
+        after = bench(mm.markdown_to_html, doc, args.docs)
+        print("{:<12} before {:8.1f}us/doc   after {:8.1f}us/doc   speedup {:5.1f}x".format(
+                    name, before, after, before/after))
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+benchmarks the batched conversion of many small markdown fields
+
+compares the conversion of the `|md` fields of a document one at a time
+(`parse_markdown`, as `applyFilters` did before) against the conversion in a
+single pass (`parse_markdown_batch`), for documents with many short fields
+of different kinds (card texts, abstracts, table cells, lists); the results
+must be identical
+
+USAGE
+
+    python3 benchmarks/bench_markdown_batch.py [--fields N] [--documents N]
+"""
+import os
+import sys
+import random
+import argparse
+from timeit import default_timer as timer
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import metamarkdown as mm
+
+
+KINDS = {
+    "cells":        lambda rnd, i: "cell {} *{}*".format(i, rnd.randrange(1000)),
+    "cards":        lambda rnd, i: "**Card {}** -- some text with a [link](https://www.example.com/{})".format(
+                                        i, rnd.randrange(1000)),
+    "abstracts":    lambda rnd, i: "Lorem ipsum dolor sit amet, *consectetur* adipiscing elit {}.\n\n"
+                                   "Donec mollis purus lorem, ac `lacinia` ligula {}.".format(i, rnd.randrange(1000)),
+    "lists":        lambda rnd, i: "- item {}\n- item {}\n\n    code {}".format(i, rnd.randrange(1000), i),
+    "mixed":        lambda rnd, i: rnd.choice(("cells", "cards", "abstracts", "lists")),
+}
+
+def fields(kind, n, seed=0):
+    """
+    the `n` markdown fields of a document
+    """
+    rnd = random.Random(seed)
+    result = []
+    for i in range(n):
+        k = kind
+        if kind == "mixed": k = KINDS["mixed"](rnd, i)
+        result.append(KINDS[k](rnd, i))
+    return result
+
+def bench(func, documents):
+    """
+    returns the best of three run times in milliseconds, and the results
+    """
+    best = None
+    for _ in range(3):
+        start = timer()
+        results = [func(document) for document in documents]
+        t = timer()-start
+        best = t if best is None else min(best, t)
+    return best * 1e3, results
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="batched markdown conversion benchmark")
+    ap.add_argument("--fields", type=int, default=40, help="number of markdown fields per document")
+    ap.add_argument("--documents", type=int, default=100, help="number of documents")
+    args = ap.parse_args()
+
+    for kind in KINDS:
+        documents = [fields(kind, args.fields, seed) for seed in range(args.documents)]
+        t1, before = bench(lambda values: [mm.parse_markdown(v) for v in values], documents)
+        t2, after = bench(mm.parse_markdown_batch, documents)
+        assert before == after, kind
+        print("{:<10} fields {:6d}   before {:8.1f}ms   after {:8.1f}ms   speedup {:5.2f}x".format(
+                    kind, args.fields*args.documents, t1, t2, t1/t2))
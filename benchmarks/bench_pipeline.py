@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+benchmarks the whole conversion pipeline on a synthetic corpus, per stage
+
+generates a corpus (see `corpus.py`) for each of the file counts given, runs
+`PageBuilderMain.run` on it (with the joint document), and times the stages
+below; the stage times are inclusive (eg `markdown` is also part of `parse`
+for the body, and of `applyFilters` for `|md` fields), and a stage called
+from another stage is counted in both
+
+    parse               metamarkdown `Parser._parse` (preamble and body)
+    filters             metamarkdown `Parser._applyFilters` (text filters)
+    markdown            `metamarkdown.markdown_to_html` (body and `|md` fields)
+    applyFilters        `PageBuilder.applyFilters` (field filters)
+    sectiontemplate     `PageBuilder._sectionTemplate`
+    pagetemplate        `PageBuilder.createHtmlPageFromHtmlAndMeta`
+    contract            `Transformer.contract` and `.applyUnder` (meta data
+                        merging and aggregation)
+    serialize           `PageBuilderMain.saveMetaAndAnalysisData`
+    total               `PageBuilderMain.run`
+
+the results can be saved as JSON (`--output`), and compared against a saved
+baseline (`--compare`); the comparison fails (exit code 1) if any stage is
+slower than the baseline by more than the tolerance (stages that take less
+than `--min-time` in the baseline are reported, but too noisy to fail)
+
+USAGE
+
+    python3 benchmarks/bench_pipeline.py [--files N[,N...]] [--body KB] [--tags N]
+                        [--filters md,tbl,dct] [--links N] [--data N] [--runs N]
+                        [--output FILE] [--compare BASELINE] [--tolerance R] [--min-time MS]
+
+    python3 benchmarks/bench_pipeline.py --files 100,200,400 --output base.json
+    ... (change the code)
+    python3 benchmarks/bench_pipeline.py --files 100,200,400 --compare base.json
+"""
+import os
+import io
+import sys
+import json
+import shutil
+import argparse
+import platform
+import tempfile
+import contextlib
+from timeit import default_timer as timer
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import metamarkdown as mm
+import pagebuilder as pb
+import transformer
+import corpus
+
+
+STAGES = (
+    ("parse",           mm.Parser,              "_parse"),
+    ("filters",         mm.Parser,              "_applyFilters"),
+    ("markdown",        mm,                     "markdown_to_html"),
+    ("applyFilters",    pb.PageBuilder,         "applyFilters"),
+    ("sectiontemplate", pb.PageBuilder,         "_sectionTemplate"),
+    ("pagetemplate",    pb.PageBuilder,         "createHtmlPageFromHtmlAndMeta"),
+    ("contract",        transformer.Transformer, "contract"),
+    ("contract",        transformer.Transformer, "applyUnder"),
+    ("serialize",       pb.PageBuilderMain,     "saveMetaAndAnalysisData"),
+    ("total",           pb.PageBuilderMain,     "run"),
+)
+
+class StageTimer():
+    """
+    context manager that times the functions in `STAGES` while active
+
+    the functions are replaced by timing wrappers on entry, and restored on
+    exit; `s.stages` is the dict stage: {"time": seconds, "calls": count}
+    """
+
+    def __init__(s, stages=STAGES):
+        s._stages = stages
+        s._saved = []
+        s.stages = {name: {"time": 0.0, "calls": 0} for name, _, _ in stages}
+
+    def _wrap(s, name, func):
+        stage = s.stages[name]
+        def timed(*args, **kwargs):
+            start = timer()
+            try: return func(*args, **kwargs)
+            finally:
+                stage["time"] += timer()-start
+                stage["calls"] += 1
+        return timed
+
+    def __enter__(s):
+        for name, owner, attr in s._stages:
+            func = getattr(owner, attr)
+            s._saved.append((owner, attr, func))
+            setattr(owner, attr, s._wrap(name, func))
+        return s
+
+    def __exit__(s, *exc):
+        for owner, attr, func in reversed(s._saved):
+            setattr(owner, attr, func)
+        s._saved = []
+
+
+def measure(path, mdfiles, runs):
+    """
+    runs the pipeline `runs` times in `path`
+
+    :returns:       the stage dict of the fastest run (see `StageTimer`)
+    """
+    best = None
+    cwd = os.getcwd()
+    os.chdir(path)
+    try:
+        for _ in range(runs):
+            with StageTimer() as t, contextlib.redirect_stdout(io.StringIO()):
+                pb.PageBuilderMain().run(mdfiles=mdfiles, join=True)
+            if best is None or t.stages["total"]["time"] < best["total"]["time"]:
+                best = t.stages
+    finally:
+        os.chdir(cwd)
+    return best
+
+def compare(results, baseline, tolerance, minTime=0):
+    """
+    prints the ratios of the stage times against the baseline
+
+    :minTime:       stages faster than this (in seconds) in the baseline are
+                    never counted as regressions
+    :returns:       list of (files, stage) slower than `tolerance` times the baseline
+    """
+    regressions = []
+    base = {run["files"]: run["stages"] for run in baseline["runs"]}
+    if baseline["corpus"] != results["corpus"]:
+        print("WARNING: the corpus parameters differ from the baseline:", baseline["corpus"])
+    for run in results["runs"]:
+        if run["files"] not in base:
+            print("files {:6d}: not in baseline".format(run["files"]))
+            continue
+        for name, stage in run["stages"].items():
+            old = base[run["files"]].get(name)
+            if not old or not old["time"]: continue
+            ratio = stage["time"] / old["time"]
+            slower = ratio > tolerance and old["time"] >= minTime
+            if slower: regressions.append((run["files"], name))
+            print("files {:6d}  {:<16} before {:9.1f}ms   after {:9.1f}ms   ratio {:5.2f} {}".format(
+                    run["files"], name, old["time"]*1e3, stage["time"]*1e3, ratio,
+                    "REGRESSION" if slower else ""))
+    return regressions
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="pipeline benchmark on a synthetic corpus")
+    ap.add_argument("--files", default="100", help="comma separated number(s) of files (one run each)")
+    ap.add_argument("--body", type=float, default=4, help="body size per file in KB")
+    ap.add_argument("--tags", type=int, default=10, help="number of meta tags per file")
+    ap.add_argument("--filters", default="md,tbl,dct", help="comma separated field filters used by the tags")
+    ap.add_argument("--links", type=int, default=100, help="number of link definitions in _SETTINGS")
+    ap.add_argument("--data", type=int, default=100, help="number of additional records in _DATA.yaml")
+    ap.add_argument("--runs", type=int, default=3, help="number of runs per file count (the fastest is kept)")
+    ap.add_argument("--output", metavar="FILE", help="save the results as JSON")
+    ap.add_argument("--compare", metavar="BASELINE", help="compare against the results saved in BASELINE")
+    ap.add_argument("--tolerance", type=float, default=1.25, help="maximum time ratio against the baseline")
+    ap.add_argument("--min-time", type=float, default=10, help="minimum baseline stage time (in ms) for a regression")
+    args = ap.parse_args()
+
+    params = {
+        "body":     args.body,
+        "tags":     args.tags,
+        "filters":  [f for f in args.filters.split(",") if f],
+        "links":    args.links,
+        "data":     args.data,
+    }
+    results = {
+        "python":   platform.python_version(),
+        "platform": platform.platform(),
+        "corpus":   params,
+        "runs":     [],
+    }
+    for files in (int(n) for n in args.files.split(",")):
+        path = tempfile.mkdtemp(prefix="pagebuilder-bench-")
+        try:
+            mdfiles = corpus.generate(path, files=files, **dict(params, filters=tuple(params["filters"])))
+            stages = measure(path, mdfiles, args.runs)
+        finally:
+            shutil.rmtree(path)
+        results["runs"].append({"files": files, "stages": stages})
+        for name, stage in stages.items():
+            print("files {:6d}  {:<16} {:9.1f}ms  {:8d} calls  {:8.1f}us/file".format(
+                    files, name, stage["time"]*1e3, stage["calls"], stage["time"]/files*1e6))
+
+    if args.output:
+        with open(args.output, "w") as f: json.dump(results, f, indent=2)
+        print("results saved to", args.output)
+
+    if args.compare:
+        with open(args.compare) as f: baseline = json.load(f)
+        if compare(results, baseline, args.tolerance, args.min_time/1e3):
+            sys.exit(1)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+benchmarks the metamarkdown preamble scanner (`Parser._parse`)
+
+compares the previous line-by-line implementation (`legacy_parse`, copied
+below) against the current scanner, for a document with a large body and for
+a document with hundreds of tags
+
+USAGE
+
+    python3 benchmarks/bench_preamble.py [--docs N]
+"""
+import os
+import re
+import sys
+import argparse
+from collections import OrderedDict
+from timeit import default_timer as timer
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import metamarkdown as mm
+
+
+def legacy_parse(doc):
+    """
+    the previous implementation of `Parser._parse` (including its helpers)
+    """
+    def _starts_with_space(line):
+        try: return line[0] == ' '
+        except IndexError: return True
+    def _num_leading_spaces(line):
+        try:
+            ix = 0
+            while line[ix] == ' ': ix += 1
+            return ix
+        except IndexError:
+            return len(line)
+    def _remove_leading_spaces(lines):
+        if not lines: return lines
+        num_leading_spaces = _num_leading_spaces(lines[0])
+        return [l[num_leading_spaces:] for l in lines]
+    def _ziprange(alist, ix):
+        blist = alist.copy()
+        blist.append(ix)
+        del blist[0]
+        return zip(alist, blist)
+
+    doclines = doc.split("\n")
+    ix = 0
+    taglines = []
+    tags = []
+    while True:
+        try: line = doclines[ix]
+        except IndexError: break
+        if not _starts_with_space(line):
+            m = re.match("^(:[a-zA-Z0-9_|]*:)", line)
+            if m:
+                taglines.append(ix)
+                tags.append(m.group(0)[1:-1].lower())
+            elif taglines:
+                break
+        ix += 1
+    if taglines:
+        body = "\n".join([doclines[i] for i in range(ix, len(doclines))])
+    else:
+        body = "\n".join(l for l in doclines)
+    for i,tagi in zip (taglines, tags):
+        leni = len(tagi)+2
+        doclines[i] = " " * leni + doclines[i][leni:]
+    taglist = [[doclines[i] for i in range(start, end)] for start, end in _ziprange(taglines, ix)]
+    taglist = [_remove_leading_spaces(tl) for tl in taglist]
+    tags_dict = OrderedDict(
+        ((tagi, "\n".join(taglinesi)) for tagi, taglinesi in zip(tags, taglist))
+    )
+    return (tags_dict, body)
+
+
+LARGE_BODY = ":title: Large Body\n:tags: a, b, c\n\n" + \
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit.\n" * 20000
+
+MANY_TAGS = "".join(
+    ":field{0}:      value {0}\n                continued {0}\n".format(i) for i in range(500)
+) + "\n# Body\n\nsome text\n"
+
+def bench(parse, doc, docs):
+    """
+    returns the time per document in microseconds
+    """
+    start = timer()
+    for _ in range(docs):
+        parse(doc)
+    return (timer()-start) / docs * 1e6
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="preamble scanner benchmark")
+    ap.add_argument("--docs", type=int, default=200, help="number of documents parsed")
+    args = ap.parse_args()
+
+    parser = mm.Parser()
+    for name, doc in (("large body", LARGE_BODY), ("many tags", MANY_TAGS)):
+        assert legacy_parse(doc) == parser._parse(doc)
+        before = bench(legacy_parse, doc, args.docs)
+        after = bench(parser._parse, doc, args.docs)
+        print("{:<12} before {:10.1f}us/doc   after {:10.1f}us/doc   speedup {:6.1f}x".format(
+                    name, before, after, before/after))
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+benchmarks the per-file template rendering cost
+
+compares the compiled templates (`PageBuilder._processTemplate`) against
+the previous implementation that re-parsed the template source, including
+its :defaults: tag, on every render
+
+USAGE
+
+    python3 benchmarks/bench_templates.py [--files N]
+"""
+import os
+import sys
+import argparse
+from timeit import default_timer as timer
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import metamarkdown as mm
+from pagebuilder import PageBuilder, DICTSEP
+
+
+def legacy_process_template(builder, template_name, specific_params):
+    """
+    the template processing as it was before templates were compiled
+    (reduced to the non-error path)
+    """
+    template = specific_params.get("_sectiontemplate", None)
+    if template is None or template_name == "_template":
+        template = builder.p[template_name]
+    parser = lambda str1: mm.parse_dict(str1, sep=DICTSEP)
+    result = mm.parsetext(template, fieldParsers={"defaults": parser})
+    template = result.body
+    params = result.meta.get("defaults", {})
+    params = {k: builder.p[k] if k in builder.p else v for k,v in params.items()}
+    params.update(specific_params)
+    if params: template = template.format(**params)
+    return template
+
+def render_file(process, builder, sectiontemplate):
+    """
+    renders one file's section template, style and page template using `process`
+    """
+    params = {
+        "_filename":        "file.md",
+        "sectiontemplate":  sectiontemplate,
+        "heading":          "Heading",
+        "title":            "Title",
+        "body":             "<p>Lorem ipsum dolor sit amet</p>\n" * 20,
+    }
+    section = process(builder, "_sectiontemplate_"+sectiontemplate, params)
+    style = process(builder, "_style", {})
+    return process(builder, "_template",
+                    dict(params, body=section, style=style, metatags=""))
+
+def bench(process, builder, sectiontemplate, files):
+    """
+    returns the time per file in microseconds
+    """
+    start = timer()
+    for _ in range(files):
+        render_file(process, builder, sectiontemplate)
+    return (timer()-start) / files * 1e6
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="template rendering benchmark")
+    ap.add_argument("--files", type=int, default=2000, help="number of files rendered")
+    args = ap.parse_args()
+
+    builder = PageBuilder()
+    compiled = lambda b, name, params: b._processTemplate(name, params)
+    for sectiontemplate in ("default", "chapter", "titlepage"):
+        assert render_file(compiled, builder, sectiontemplate) == \
+                    render_file(legacy_process_template, builder, sectiontemplate)
+        before = bench(legacy_process_template, builder, sectiontemplate, args.files)
+        after = bench(compiled, builder, sectiontemplate, args.files)
+        print("{:<12} before {:8.1f}us/file   after {:8.1f}us/file   speedup {:5.1f}x".format(
+                    sectiontemplate, before, after, before/after))
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+benchmarks loading a large _DATA.yaml file
+
+compares `yaml.safe_load` (pure python) against `transformer.yaml_load`
+(libyaml if available) on a generated file that looks like the `_DATA.yaml`
+files fed back from a processing step (a `_select` entry per input file)
+
+USAGE
+
+    python3 benchmarks/bench_yaml.py [--files N]
+"""
+import os
+import sys
+import argparse
+from timeit import default_timer as timer
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import yaml
+import transformer
+
+
+def generate(files):
+    """
+    returns the YAML text of a generated data file with `files` entries
+    """
+    data = {
+        "project":  "benchmark",
+        "version":  1.0,
+        "_select":  {
+            "{:05d}_section.md".format(i): {
+                "id":           i,
+                "title":        "Section {} -- lorem ipsum dolor sit amet".format(i),
+                "tags":         ["lorem", "ipsum", "tag{}".format(i%17)],
+                "score":        i * 0.25,
+                "draft":        i % 3 == 0,
+                "summary":      "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 3,
+                "links":        {"prev": i-1, "next": i+1},
+            }
+            for i in range(files)
+        },
+    }
+    return yaml.dump(data, default_flow_style=False)
+
+def bench(load, text, runs):
+    """
+    returns the time per load in milliseconds
+    """
+    start = timer()
+    for _ in range(runs):
+        load(text)
+    return (timer()-start) / runs * 1e3
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="YAML loading benchmark")
+    ap.add_argument("--files", type=int, default=5000, help="number of entries in the data file")
+    ap.add_argument("--runs", type=int, default=3, help="number of loads timed")
+    args = ap.parse_args()
+
+    text = generate(args.files)
+    assert yaml.safe_load(text) == transformer.yaml_load(text)
+    print("data file: {:.1f} MB, loader: {}".format(len(text)/1024/1024, transformer.SafeLoader.__name__))
+    before = bench(yaml.safe_load, text, args.runs)
+    after = bench(transformer.yaml_load, text, args.runs)
+    print("before {:8.1f}ms   after {:8.1f}ms   speedup {:5.1f}x".format(before, after, before/after))
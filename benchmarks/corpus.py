@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+generates a synthetic metamarkdown corpus for the pipeline benchmarks
+
+the corpus is a directory with `files` metamarkdown files, a _SETTINGS file
+with `links` link definitions (referenced from the bodies) and a _DATA.yaml
+file with a `_select` entry per file plus `data` additional records
+
+USAGE
+
+    python3 benchmarks/corpus.py DIRECTORY [--files N] [--body KB] [--tags N]
+                                 [--filters md,tbl,dct] [--links N] [--data N]
+
+    from corpus import generate
+    mdfiles = generate("/tmp/corpus", files=100, filters=("md", "tbl"))
+"""
+import os
+import random
+import argparse
+
+import yaml
+
+
+LOREM = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit. Donec mollis purus "
+    "lorem, ac lacinia ligula malesuada id. Sed ut ante nec lacus convallis -- "
+    "consequat. Cras nec felis ac metus aliquam tempor non sed quam. Vivamus dui "
+    "felis, sollicitudin sed nibh at, *commodo* condimentum erat. Fusce euismod mi "
+    "sed nibh vestibulum vehicula. Nunc pulvinar **molestie** vestibulum."
+).split(" ")
+
+FILTERS = ("md", "pre", "div", "dct", "ln", "csv", "tbl", "tbltd", "tblh", "tblv", "brk")
+    # the field filters of `PageBuilder.applyFilters` (except `now`, whose
+    # output is not reproducible)
+
+VALUES = {
+    "md":       "some **bold** text -- with a [link][{link}]\n\nand a second paragraph",
+    "dct":      "key1 => value 1,\nkey2 => value 2,\nkey3 => value 3",
+    "ln":       "line one\nline two\nline three",
+    "csv":      "one, two, three, four",
+    "tbl":      "col1, col2, col3\nrow1, 11, 12\nrow2, 21, 22",
+    "brk":      "first paragraph\n\nsecond paragraph\nwith a break",
+}
+VALUES["tbltd"] = VALUES["tblh"] = VALUES["tblv"] = VALUES["tbl"]
+VALUES["pre"] = VALUES["div"] = "some <em>html</em> text\nsecond line"
+
+def _tag(name, value):
+    """
+    the preamble lines for the tag `name` (values aligned at column 24)
+    """
+    lines = value.split("\n")
+    head = ":{}:".format(name).ljust(23) + " " + lines[0]
+    return "\n".join([head] + [(" "*24 + line).rstrip() for line in lines[1:]])
+
+def _paragraph(rnd, links):
+    """
+    a random paragraph (with a link reference if there are any links)
+    """
+    words = [rnd.choice(LOREM) for _ in range(rnd.randint(40, 80))]
+    if links:
+        words.insert(rnd.randrange(len(words)), "[link][link{}]".format(rnd.randrange(links)))
+    return " ".join(words)
+
+def document(i, body=4, tags=10, filters=("md", "tbl", "dct"), links=100, rnd=None):
+    """
+    the text of the `i`-th metamarkdown file of the corpus
+
+    :body:          body size in KB (approximately)
+    :tags:          number of meta tags (title and heading included)
+    :filters:       the filters used by the other tags, in turn (plain tags
+                    if empty)
+    :links:         number of link definitions in the settings file
+    """
+    if rnd is None: rnd = random.Random(i)
+    preamble = [_tag("title", "Document {}".format(i)), _tag("heading", "Heading {}".format(i))]
+    for t in range(max(0, tags-2)):
+        if filters:
+            f = filters[t % len(filters)]
+            value = VALUES[f].format(link="link{}".format(rnd.randrange(links)) if links else "none")
+            preamble.append(_tag("field{}|{}".format(t, f), value))
+        else:
+            preamble.append(_tag("field{}".format(t), "value {} of document {}".format(t, i)))
+    parts = ["# Document {}".format(i)]
+    size = 0
+    while size < body * 1024:
+        if len(parts) % 5 == 0:
+            parts.append("## Section {}".format(len(parts)))
+        parts.append(_paragraph(rnd, links))
+        size += len(parts[-1])
+    return "\n".join(preamble) + "\n\n" + "\n\n".join(parts) + "\n"
+
+def generate(path, files=100, body=4, tags=10, filters=("md", "tbl", "dct"), links=100, data=100, seed=0):
+    """
+    writes the corpus to the directory `path` (created if needed)
+
+    :files:         number of metamarkdown files
+    :data:          number of records in _DATA.yaml in addition to the
+                    `_select` entries (one per file)
+    :seed:          the random seed (the corpus only depends on the parameters)
+    :returns:       the list of the metamarkdown file names (relative to `path`)
+
+    see `document` for the other parameters
+    """
+    unknown = set(filters) - set(FILTERS)
+    if unknown: raise ValueError("Unknown filter(s): {}".format(", ".join(sorted(unknown))))
+    os.makedirs(path, exist_ok=True)
+    rnd = random.Random(seed)
+    mdfiles = []
+    for i in range(files):
+        fn = "{:05d}_document.md".format(i)
+        with open(os.path.join(path, fn), "w") as f:
+            f.write(document(i, body, tags, filters, links, rnd))
+        mdfiles.append(fn)
+
+    settings = [_tag("author", "Benchmark"), "", "// link definitions"]
+    settings += ["[link{0}]:https://www.example.com/page{0}".format(i) for i in range(links)]
+    with open(os.path.join(path, "_SETTINGS"), "w") as f:
+        f.write("\n".join(settings) + "\n")
+
+    records = {
+        "record{}".format(i): {"id": i, "name": "Record {}".format(i), "values": [i, i+1, i+2]}
+        for i in range(data)
+    }
+    records["_select"] = {
+        fn: {"id": i, "summary": "Summary of document {} -- lorem ipsum".format(i)}
+        for i, fn in enumerate(mdfiles)
+    }
+    with open(os.path.join(path, "_DATA.yaml"), "w") as f:
+        yaml.dump(records, f, default_flow_style=False)
+
+    return mdfiles
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="synthetic metamarkdown corpus generator")
+    ap.add_argument("directory", help="the output directory")
+    ap.add_argument("--files", type=int, default=100, help="number of metamarkdown files")
+    ap.add_argument("--body", type=float, default=4, help="body size per file in KB")
+    ap.add_argument("--tags", type=int, default=10, help="number of meta tags per file")
+    ap.add_argument("--filters", default="md,tbl,dct", help="comma separated field filters used by the tags")
+    ap.add_argument("--links", type=int, default=100, help="number of link definitions in _SETTINGS")
+    ap.add_argument("--data", type=int, default=100, help="number of additional records in _DATA.yaml")
+    ap.add_argument("--seed", type=int, default=0, help="random seed")
+    args = ap.parse_args()
+
+    mdfiles = generate(args.directory, args.files, args.body, args.tags,
+                        tuple(f for f in args.filters.split(",") if f), args.links, args.data, args.seed)
+    print("generated {} files in {}".format(len(mdfiles), args.directory))
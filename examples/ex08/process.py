@@ -1,6 +1,12 @@
 #!/usr/bin/env python3
 """
 process data generated by PageBuilder
+
+USAGE
+
+    ./process.py                        # reads document.json, writes _DATA.json
+
+    pagebuilder.py --aggregate process.py:aggregate ...
 """
 
 import json
@@ -16,43 +22,50 @@ TOC = """
 """
 
 
-print ("PROCESSING ===========================================================")
+def aggregate(document_data):
+    """
+    aggregates the meta data of all files (the records in document.json)
+    """
+    print ("analysing {} records".format(len(document_data)))
+
+    sum_magicnums = 0
+    magicwords = []
+    headings = []
+    for r in document_data:
+        if "magicnum" in r:
+            sum_magicnums += int(r["magicnum"])
+        if "magicword" in r:
+            magicwords.append(r["magicword"])
+        if "heading" in r:
+            headings.append(r["heading"])
 
-print ("reading", INFN)
-with open(INFN, "r") as f: document_json = f.read()
-print ("parsing", INFN)
-document_data = json.loads(document_json)
-print ("analysing {} ({} records)".format(INFN, len(document_data)))
+    # magic
+    magicwords = ", ".join(magicwords)
+    print("magic words:", magicwords)
+    print("sum magic numbers:", sum_magicnums)
 
-sum_magicnums = 0
-magicwords = []
-headings = []
-for r in document_data:
-    if "magicnum" in r:
-        sum_magicnums += int(r["magicnum"])
-    if "magicword" in r:
-        magicwords.append(r["magicword"])
-    if "heading" in r:
-        headings.append(r["heading"])
+    # TOC
+    print("headings:", headings)
+    toc = "\n".join(TOC_LINE.format(h) for h in headings)
+    toc = TOC.format(toc)
+    print("toc:")
+    print(toc)
 
-# magic
-magicwords = ", ".join(magicwords)
-print("magic words:", magicwords)
-print("sum magic numbers:", sum_magicnums)
+    return {
+        "sum_magicnums":    sum_magicnums,
+        "aggr_magicwords":  magicwords,
+        "toc":              toc,
+    }
 
-# TOC
-print("headings:", headings)
-toc = "\n".join(TOC_LINE.format(h) for h in headings)
-toc = TOC.format(toc)
-print("toc:")
-print(toc)
 
+if __name__ == "__main__":
+    print ("PROCESSING ===========================================================")
 
-with open(OUTFN, "w") as f: f.write(json.dumps({
-    "sum_magicnums":    sum_magicnums,
-    "aggr_magicwords":  magicwords,
-    "toc":              toc,
-}))
+    print ("reading", INFN)
+    with open(INFN, "r") as f: document_json = f.read()
+    print ("parsing", INFN)
+    document_data = json.loads(document_json)
 
+    with open(OUTFN, "w") as f: f.write(json.dumps(aggregate(document_data)))
 
-print ("END PROCESSING =======================================================")
+    print ("END PROCESSING =======================================================")
@@ -1,6 +1,12 @@
 #!/usr/bin/env python3
 """
 process data generated by PageBuilder
+
+USAGE
+
+    ./process.py                        # reads document.json, writes _DATA.json
+
+    pagebuilder.py --aggregate process.py:aggregate ...
 """
 
 import json
@@ -10,43 +16,48 @@ OUTFN   = "_DATA.json"
 
 
 
-print ("PROCESSING ===========================================================")
+def aggregate(document_data):
+    """
+    aggregates the meta data of all files (the records in document.json)
+    """
+    #print ("analysing {} ({} records)".format(INFN, len(document_data)))
+    #refs = document_analysis['references']
+    refs = []
 
-########################################################################
-## READING THE INPUT FILE
-print ("reading", INFN)
-with open(INFN, "r") as f: _json = f.read()
-document_data = json.loads(_json)
+    select = {}
 
-#print ("analysing {} ({} records)".format(INFN, len(document_data)))
-#refs = document_analysis['references']
-refs = []
+    for d in document_data:
 
-select = {}
+        refs = d['_analysis']['references']
+        TEMPLATE = "[{0[0]}] {0[1]} <a href='{0[1]}'>go</a>"
+        TEMPLATE = "<li>{}</li>".format(TEMPLATE)
+        ref_html = "\n".join(
+            TEMPLATE.format(r)
+            for r in refs
+        )
+        #ref_html = "<ul>\n{}\n</ul>\n".format(ref_html)
+        print("FILENAME", d['_filename'], len(refs))
+        #print("REFERENCES", ref_html)
+        select[d['_filename']] = {"refs": ref_html}
+    #print(ref_html)
 
-for d in document_data:
+    return {
+        "_select": select,
+    }
 
-    refs = d['_analysis']['references']
-    TEMPLATE = "[{0[0]}] {0[1]} <a href='{0[1]}'>go</a>"
-    TEMPLATE = "<li>{}</li>".format(TEMPLATE)
-    ref_html = "\n".join(
-        TEMPLATE.format(r)
-        for r in refs
-    )
-    #ref_html = "<ul>\n{}\n</ul>\n".format(ref_html)
-    print("FILENAME", d['_filename'], len(refs))
-    #print("REFERENCES", ref_html)
-    select[d['_filename']] = {"refs": ref_html}
-#print(ref_html)
 
+if __name__ == "__main__":
+    print ("PROCESSING ===========================================================")
 
-########################################################################
-## WRITING THE OUTPUT FILE
-out = {
-    "_select": select,
-}
-with open(OUTFN, "w") as f: f.write(json.dumps(out))
-#print("OUT:", out)
+    ########################################################################
+    ## READING THE INPUT FILE
+    print ("reading", INFN)
+    with open(INFN, "r") as f: _json = f.read()
+    document_data = json.loads(_json)
 
+    ########################################################################
+    ## WRITING THE OUTPUT FILE
+    with open(OUTFN, "w") as f: f.write(json.dumps(aggregate(document_data)))
+    #print("OUT:", out)
 
-print ("END PROCESSING =======================================================")
+    print ("END PROCESSING =======================================================")
@@ -39,11 +39,94 @@ __version__ = "1.2"
 
 
 import re
+import threading
 import markdown as mdwn
 from collections import OrderedDict
 from collections import namedtuple
 from types import SimpleNamespace
 from datetime import datetime
+from timing import timings
+
+
+################################################################################
+## MARKDOWN ENGINE
+################################################################################
+
+# Creating a `markdown.Markdown` instance (what `markdown.markdown()` does on
+# every call) sets up all its processors and extensions, which for small
+# documents costs more than the conversion itself; the engines are therefore
+# created once per thread and configuration, and reset between documents
+
+_engines = threading.local()
+
+class _ReferencesTreeprocessor(mdwn.treeprocessors.Treeprocessor):
+    """
+    adds predefined link references to the engine's reference table
+
+    it runs after the block parser has collected the link definitions of the
+    document, and before the inline processor resolves the links, so the
+    predefined references behave as if they were defined at the end of the
+    document
+    """
+    references = None
+
+    def run(s, root):
+        if s.references: s.md.references.update(s.references)
+
+def _markdown_engine(**config):
+    """
+    returns the (thread-local) markdown engine for the given configuration
+
+    :config:    the keyword arguments for `markdown.Markdown`
+    :returns:   the `markdown.Markdown` instance (not reset)
+    """
+    try:
+        engines = _engines.engines
+    except AttributeError:
+        engines = _engines.engines = {}
+    key = repr(sorted(config.items()))
+    try:
+        return engines[key]
+    except KeyError:
+        engine = engines[key] = mdwn.Markdown(**config)
+        engine.treeprocessors.register(_ReferencesTreeprocessor(engine), "pb_references", 25)
+        return engine
+
+def markdown_to_html(md, references=None, **config):
+    """
+    converts markdown to html (same result as `markdown.markdown`)
+
+    :md:            the markdown text
+    :references:    dict of additional link references, as returned by
+                    `markdown_references`; they take precedence over the
+                    link definitions in `md`
+    :config:        the keyword arguments for `markdown.Markdown`
+    :returns:       the html
+    """
+    engine = _markdown_engine(**config)
+    engine.reset()
+    refproc = engine.treeprocessors["pb_references"]
+    refproc.references = references
+    try:
+        with timings.stage("markdown"):
+            return engine.convert(md)
+    finally:
+        refproc.references = None
+
+def markdown_references(md, **config):
+    """
+    parses the link definitions (`[name]:url`) in a markdown text
+
+    :md:        the markdown text
+    :config:    the keyword arguments for `markdown.Markdown`
+    :returns:   dict(name: (url, title)) in the format of the markdown engine's
+                reference table (suitable for `markdown_to_html(references=...)`)
+    """
+    engine = _markdown_engine(**config)
+    engine.reset()
+    engine.convert(md)
+    return dict(engine.references)
+
 
 
 ################################################################################
@@ -215,7 +298,34 @@ def parse_markdown(s):
     :returns:   the html associated with the markdown
                 (also replaces '--' with em-dash)
     """
-    return mdwn.markdown(_replace_emdash(s))
+    return markdown_to_html(_replace_emdash(s))
+
+# the fields of `parse_markdown_batch` are separated by horizontal rules, which
+# are cheap for the engine (no inline processing) and end every open block; the
+# fields that could contain a rule, html (eg an unclosed block that would run
+# into the next field) or link definitions (which apply to the whole document),
+# and those whose first line is blank but not empty (which the engine only keeps
+# at the start of a document) are converted on their own
+_BATCH_SEPARATOR    = "\n\n***\n\n"
+_BATCH_SPLIT        = "\n<hr />\n"
+_UNBATCHABLE        = re.compile(r"<|\]:|[\r\x02\x03]|^[ \t>]*[-*_][-*_ \t]*$|\A[ \t]+$", re.MULTILINE)
+
+def parse_markdown_batch(values):
+    """
+    parser for markdown, converting many strings in one pass
+
+    :values:    iterable of strings which should be valid markdown
+    :returns:   list of the html associated with the markdown (the same as
+                `[parse_markdown(s) for s in values]`)
+    """
+    values = [_replace_emdash(s) for s in values]
+    results = [None] * len(values)
+    batch = [i for i, s in enumerate(values) if s.strip() and not _UNBATCHABLE.search(s)]
+    if len(batch) > 1:
+        parts = markdown_to_html(_BATCH_SEPARATOR.join(values[i] for i in batch)).split(_BATCH_SPLIT)
+        if len(parts) == len(batch):
+            for i, html in zip(batch, parts): results[i] = html
+    return [markdown_to_html(s) if html is None else html for s, html in zip(values, results)]
 
 def parse_breaks(s):
     """
@@ -268,14 +378,56 @@ def parse_now(s):
 # Filters are functions that take a string (possible also some additional
 # parameters) and that return a modification of that string; for example,
 # a the `_replace_emdash` filter replaces all double-hyphens `--` with
-# em-dashes `—`
+# em-dashes `—`; a filter whose parameter is falsy does not do anything
+#
+# All filters run in linear time, also on adversarial input. Patterns of the
+# form `^\s*X` (where `\s` also matches line breaks) are quadratic on long
+# runs of empty lines, so they are matched line by line, and the whitespace
+# in front is added afterwards (see `_linewise`).
+
+_EMDASH = re.compile(r"--\s*")
+_HEADING = re.compile(r"^#", re.MULTILINE)
+_LINE_COMMENT = re.compile(r"^[^\S\n]*//.*$", re.MULTILINE)
+_COMMENT = re.compile(r"\s//.*$", re.MULTILINE)
+_DEFINITION = re.compile(r"^[^\S\n]*\[.*\]:.*$", re.MULTILINE)
+
+def _linewise(pattern, s):
+    r"""
+    finds the matches of `^\s*X` (MULTILINE) in linear time
+
+    :pattern:       the compiled pattern `^[^\S\n]*X` (MULTILINE), where X
+                    does not match line breaks
+    :returns:       generator of (start, end) of the matches of `^\s*X`
+
+    `^\s*X` also matches the whitespace-only lines in front of the line with
+    X, up to the end of the previous match; this is where `\s*` backtracks
+    """
+    bound = 0
+    for m in pattern.finditer(s):
+        start = m.start()
+        ws = bound + len(s[bound:start].rstrip())
+        if ws == 0 or s[ws-1] == "\n": start = ws
+        else: start = s.find("\n", ws, start) + 1
+        yield start, m.end()
+        bound = m.end()
 
 def _replace_emdash(s, execute=True):
-    """
+    r"""
     replace -- with em-dash
+
+    NOTE: same as `re.sub("[\s]*--[\s]*", "—", s)`, but that regex is
+    quadratic on long runs of whitespace
     """
     if not execute: return s
-    return re.sub("[\s]*--[\s]*", "—", s)
+    parts = []
+    pos = 0
+    for m in _EMDASH.finditer(s):
+        parts.append(s[pos:m.start()].rstrip())
+        parts.append("—")
+        pos = m.end()
+    if not parts: return s
+    parts.append(s[pos:])
+    return "".join(parts)
 
 def _increase_heading_level(s, increase=0):
     """
@@ -283,28 +435,35 @@ def _increase_heading_level(s, increase=0):
     """
     if increase <= 0: return s
     repl = "#"*(increase+1)
-    return re.subn("^#", repl, s, flags=re.MULTILINE)[0]
+    return _HEADING.sub(repl, s)
 
 def _removeLineComments(s, execute=True):
     """
     removes comments (`//` to end of line)
     """
     if not execute: return s
-    return re.subn("^[\s]*//.*$", "", s, flags=re.MULTILINE)[0]
+    parts = []
+    pos = 0
+    for start, end in _linewise(_LINE_COMMENT, s):
+        parts.append(s[pos:start])
+        pos = end
+    if not parts: return s
+    parts.append(s[pos:])
+    return "".join(parts)
 
 def _removeComments(s, execute=0):
     """
     removes line comments (lines starting with `//`)
     """
     if not execute: return s
-    return re.subn("\s//.*$", "", s, flags=re.MULTILINE)[0]
+    return _COMMENT.sub("", s)
 
 def _definitionsOnly(s, execute=0):
     """
     removes all text lines (only keeps definition of the form [name]:url)
     """
     if not execute: return s
-    return "\n".join(re.findall("^\s*[[].*[\]]:.*$", s, re.MULTILINE))
+    return "\n".join(s[start:end] for start, end in _linewise(_DEFINITION, s))
 
 
 
@@ -319,6 +478,11 @@ def _definitionsOnly(s, execute=0):
 # the result of this analysis
 
 _Reference = namedtuple('Reference', ['ref', 'url'])
+_Reference.__qualname__ = '_Reference'
+    # pickle looks the class up by its qualified name, so this must match the
+    # module attribute; the YAML output still uses `metamarkdown.Reference`
+
+_REFERENCE = re.compile(r"\[([\w]*)\]:([\w:\/\.-]*)\s")
 
 def _extract_references(md, arg=None):
     """
@@ -333,8 +497,7 @@ def _extract_references(md, arg=None):
     - link definitions are of the form `[ref]:url`
     - references are returned as named tuples `Reference(ref, url)`
     """
-    pattern = "\[([\w]*)\]:([\w:\/\.-]*)\s"
-    result = re.findall(pattern, md)
+    result = _REFERENCE.findall(md)
     return {"references": tuple( _Reference(*ref) for ref in result)}
 
 
@@ -342,64 +505,13 @@ def _extract_references(md, arg=None):
 ## HELPER FUNCTIONS
 ################################################################################
 
-def _starts_with_space(line, return_on_blank=True):
-    """
-    returns true if line starts with space
-
-    :line:                  the line to be examined
-    :return_on_blank:       what to return if line == ""
-    :returns:               True if starts with space, False else
-    """
-    try: return line[0] == ' '
-    except IndexError: return return_on_blank
-
-def _ziprange(alist, ix):
-    """
-    returns zip of the list, and the one with ix added at the end and first element dropped
-
-    Example
-    -------
-
-    ::
-        alist = [2,4,7]
-        _ziprange (alist, 10)
-
-        -->
-
-        zip([2,4,7], [4,7,10]) -> (2,4), (4,7), (7,10)
-
-    """
-    blist = alist.copy()
-    blist.append(ix)
-    del blist[0]
-    return zip(alist, blist)
-
-def _num_leading_spaces(line):
-    """
-    number of leading spaces
-
-    :line:          the line to be examined
-    :returns:       number of leading spaces in line
-    """
-    try:
-        ix = 0
-        while line[ix] == ' ': ix += 1
-        return ix
-
-    except IndexError:
-        return len(line)
-
-def _remove_leading_spaces(lines):
-    """
-    removes leading spaces from group of lines
-
-    :lines:         an iterable of lines
-    :returns:       lines with leading spaces removed (number of spaces
-                    removed depends on spaces in first line)
-    """
-    if not lines: return lines
-    num_leading_spaces = _num_leading_spaces(lines[0])
-    return [l[num_leading_spaces:] for l in lines]
+_TAG = re.compile(r":[a-zA-Z0-9_|]*:")
+    # a tag at the start of a line, eg `:title:` or `:field|md:`
+_TAG_LINE = re.compile(r"^:[a-zA-Z0-9_|]*:", re.MULTILINE)
+    # the first tag line of a document
+_BODY_LINE = re.compile(r"\n(?!:[a-zA-Z0-9_|]*:)[^ \n]")
+    # the newline before a line that ends the preamble (neither empty, nor
+    # indented, nor a tag); searching for the newline is faster than `^`
 
 
 
@@ -441,6 +553,22 @@ class Parser():
         s.createHtml        = createHtml
         s.filterSettings    = filters if not filters is None else {}
         s.analyserSettings  = analysers if not analysers is None else {}
+        s._compileFilters()
+
+    def _compileFilters(s):
+        """
+        builds the filter pipeline from `filterSettings`
+
+        the pipeline is the list of (filter function, parameter) of the filters
+        that do something (ie whose parameter is not falsy), in the order of
+        `filterSettings`
+        """
+        s._pipeline = [
+            (s._filters[afilter], aparam)
+            for afilter, aparam in s.filterSettings.items()
+            if aparam
+        ]
+        s._pipelineSettings = dict(s.filterSettings)
 
 
     ######################################################################
@@ -452,13 +580,9 @@ class Parser():
         :doc:           the document
         :returns:       the document with filters applied
         """
-        for afilter, aparam in s.filterSettings.items():
-            if aparam is False: continue
-            try:
-                filterf = s._filters[afilter]
-                doc = filterf(doc, aparam)
-            except:
-                raise
+        if s._pipelineSettings != s.filterSettings: s._compileFilters()
+        for filterf, aparam in s._pipeline:
+            doc = filterf(doc, aparam)
         return doc
 
     ######################################################################
@@ -509,75 +633,37 @@ class Parser():
 
         """
 
-        # split the document in individual lines
-        doclines = doc.split("\n")
-
-        # loop over the lines
-        ix = 0          # loopindex
-        taglines = []   # collects the ix numbers of tag lines
-        tags = []       # collects that tags
-        while True:
-
-            # get the current line
-            try: line = doclines[ix]
-            except IndexError: break
-
-            # check whether is starts with space or is empty
-            if not _starts_with_space(line):
-
-                # yes: check whether it is start of a tag
-                m = re.match("^(:[a-zA-Z0-9_|]*:)", line)
-                if m:
-
-                    # yes: remember index
-                    taglines.append(ix)
-                    thetag = m.group(0)[1:-1]
-                    tags.append(thetag.lower())
-
-
-                else:
-                    # no, not start of a tag: check whether we already have found tags
-                    if taglines:
-
-                        # yes: this means we are done here, we've found the body
-                        # at this point, line == docline[ix] is the first body line
-                        break
-
-                    else:
-                        # no: this means we are still parsing the title area
-                        pass
-
-
-            # next line
-            ix += 1
-
-        # when we leave the loop, ix will be the first body line
-
-
-        if taglines:
-            # general case: we have tags, so title pre tags, body post tags
-            title = "\n".join([doclines[i] for i in range(0, taglines[0])])
-            body = "\n".join([doclines[i] for i in range(ix, len(doclines))])
+        # the preamble starts at the first tag line; without tags, the whole
+        # document is the body (and anything before the first tag is title
+        # area, which is discarded)
+        first = _TAG_LINE.search(doc)
+        if first is None:
+            return (OrderedDict(), doc)
+
+        # the body starts at the first line after that which is neither empty,
+        # nor starts with a space (ie continuation), nor is a tag line
+        bodystart = _BODY_LINE.search(doc, first.end())
+        if bodystart is None:
+            preamble, body = doc[first.start():], ""
         else:
-            # otherwise we set title to None, and the whole text is just put into body
-            title, body = "", "\n".join(l for l in doclines)
-
-        # we remove the tags themselves from the doclines, and replace them with spaces
-        for i,tagi in zip (taglines, tags):
-            leni = len(tagi)+2
-            doclines[i] = " " * leni + doclines[i][leni:]
-
-        # now we collect all lines that belong to the tags
-        # if taglines is (3,7,10,...) then _ziprange is ( (3,7), (7, 10), ...)
-        taglist = [[doclines[i] for i in range(start, end)] for start, end in _ziprange(taglines, ix)]
-
-        # now we remove the leading spaces from the taglines (determined by first indent)
-        taglist = [_remove_leading_spaces(tl) for tl in taglist]
-
-        # now pack this all into an OrderedDict and merge the lines again
-        tags_dict = OrderedDict(
-            ((tagi, "\n".join(taglinesi)) for tagi, taglinesi in zip(tags, taglist))
-        )
+            preamble, body = doc[first.start():bodystart.start()], doc[bodystart.start()+1:]
+
+        # collect the values: the first line of a tag value is what follows the
+        # tag (without leading spaces), and continuation lines are unindented by
+        # the column where the first line's value starts
+        tags_dict = OrderedDict()
+        tag = None
+        for line in preamble.split("\n"):
+            m = _TAG.match(line)
+            if m:
+                if tag is not None: tags_dict[tag] = "\n".join(value)
+                tag = m.group(0)[1:-1].lower()
+                rest = line[m.end():].lstrip(" ")
+                indent = len(line) - len(rest)
+                value = [rest]
+            else:
+                value.append(line[indent:])
+        tags_dict[tag] = "\n".join(value)
 
         return (tags_dict, body)
 
@@ -585,13 +671,15 @@ class Parser():
 
     ######################################################################
     ## PARSE
-    def parse (s, doc, fieldParsers=None, createHtml=True):
+    def parse (s, doc, fieldParsers=None, createHtml=True, references=None):
         """
         parses a meta-markdown document (starts with rst-like meta data, then markdown)
 
         :doc:               the meta-markdown document
         :fieldParsers:      dict fieldName: fieldParser
         :createHtml:        if True (default), create html from markdown
+        :references:        predefined link references for the html conversion
+                            (see `markdown_references`)
         :returns:           the function returns a SimpleNamespace where the meta fields
                             are in `.meta` and the raw body is in `.body`. If html is
                             created this is in `.html`
@@ -618,17 +706,20 @@ class Parser():
         if fieldParsers is None: fieldParsers = {}
 
         # parse the document into a tags dict and a markdown body
-        tags, body = s._parse(doc)
+        with timings.stage("parse.preamble"):
+            tags, body = s._parse(doc)
 
         # parse the tags using the respective field parsers
-        meta = OrderedDict()
-        for tagi, tagdatai in tags.items():
-            if tagi in fieldParsers: parse = fieldParsers[tagi]
-            else:                    parse = parse_str
-            meta[tagi] = parse(tagdatai)
+        with timings.stage("parse.fields"):
+            meta = OrderedDict()
+            for tagi, tagdatai in tags.items():
+                if tagi in fieldParsers: parse = fieldParsers[tagi]
+                else:                    parse = parse_str
+                meta[tagi] = parse(tagdatai)
 
         # apply all selected filters to the markdown
-        body = s._applyFilters(body)
+        with timings.stage("parse.filters"):
+            body = s._applyFilters(body)
 
             # TODO: increase headinglevels is a bit complex because
             # the info whether to increase or not is contained _in_
@@ -636,11 +727,12 @@ class Parser():
             # file must be scanned twice...
 
         # apply the selected analysers to the markdown
-        analysis = s._applyAnalysers(body)
+        with timings.stage("parse.analysers"):
+            analysis = s._applyAnalysers(body)
 
         # convert the markdown to html (if desired)
         if s.createHtml and createHtml:
-            html = mdwn.markdown(body)
+            html = markdown_to_html(body, references=references)
         else:
             html = None
 
@@ -24,11 +24,12 @@ __version__ = "4.1"
 # are more important things to do...
 
 import metamarkdown as mm
-import markdown as mdwn
-from transformer import contract
+from transformer import contract, LayeredDict
+from timing import timings
 from collections import namedtuple
 from collections import OrderedDict
-from copy import deepcopy
+from collections import ChainMap
+from copy import copy
 import json
 import yaml
 import re
@@ -361,6 +362,168 @@ def _grouper(iterable, n=2, fillvalue=None):
 
 
 
+########################################################################################
+## CLASS TEMPLATE
+
+from string import Formatter
+
+class Template():
+    """
+    a template string (eg page, section or style template), compiled once
+
+    :source:        the template source, optionally starting with a :defaults: tag
+
+    after compilation the following attributes are available
+    :defaults:      the dict from the :defaults: tag (empty if none)
+    :body:          the template text itself (a `str.format` string)
+    :fields:        tuple of the (top level) field names used in the template,
+                    or None if the template is not a valid format string
+
+    USAGE
+
+        t = Template(":defaults: a => 1\n\n{a} and {b}")
+        t.defaults              # OrderedDict([('a', '1')])
+        t.fields                # ('a', 'b')
+        t.render({'a': 2, 'b': 3})   # '2 and 3'
+
+    NOTE: templates whose only field is `{body}` (eg the built-in `default`
+    and `clean` section templates) are rendered by concatenation
+    """
+
+    _parse = mm.Parser(
+                fieldParsers    = {"defaults": lambda str1: mm.parse_dict(str1, sep=DICTSEP)},
+                createHtml      = False,
+    )
+
+    def __init__(s, source):
+        s.source = source
+
+        # process the :defaults: tag (which for an inline template is a tag in a tag ¯\_(ツ)_/¯)
+        result = s._parse(source)
+        s.body = result.body
+        s.defaults = result.meta.get("defaults", {})
+
+        # analyse the fields; `_bodyOnly` is (prefix, suffix) for `{body}` only templates
+        s._bodyOnly = None
+        try:
+            parsed = list(Formatter().parse(s.body))
+        except ValueError:
+            s.fields = None
+            return
+        fields = []
+        for _, field, spec, conversion in parsed:
+            if field is None: continue
+            field = re.split(r"[.\[]", field, maxsplit=1)[0]
+            if not field in fields: fields.append(field)
+        s.fields = tuple(fields)
+
+        if s.fields == ("body",) and len(parsed) <= 2:
+            literal1, field, spec, conversion = parsed[0]
+            literal2 = parsed[1][0] if len(parsed) == 2 else ""
+            if field == "body" and not spec and not conversion:
+                s._bodyOnly = (literal1, literal2)
+
+    def render(s, params):
+        """
+        renders the template (like `body.format_map(params)`)
+
+        :params:    the parameter mapping (eg a dict or a `ChainMap`); only the
+                    fields used in the template are looked up
+        :returns:   the rendered template; if `params` is empty the body
+                    is returned without formatting
+        """
+        if not params: return s.body
+        if s._bodyOnly is not None:
+            prefix, suffix = s._bodyOnly
+            return prefix + format(params["body"], "") + suffix
+        return s.body.format_map(params)
+
+
+
+
+########################################################################################
+## CLASS FILTER CACHE
+
+import threading
+
+class FilterCache():
+    """
+    bounded LRU cache for the results of the field filters (see `PageBuilder.applyFilters`),
+    also used for the compiled inline templates (see `PageBuilder._compiledTemplate`)
+
+    :maxsize:       the maximum number of entries (the least recently used
+                    entries are evicted first); if 0, nothing is cached
+
+    after creation the following attributes are available
+    :hits:          number of lookups answered from the cache
+    :misses:        number of lookups where the result had to be computed
+
+    USAGE
+
+        cache = FilterCache(1024)
+        html = cache.get(("md", "summary", text), lambda: mm.parse_markdown(text))
+        print(cache.hits, cache.misses, len(cache))
+
+    NOTES
+    - the keys must identify the result completely, eg (filter, field, value);
+      lookups with unhashable keys are computed, but not cached
+    - the cached results are shared between the callers, so mutable results
+      (eg dicts) must be copied before they are changed
+    - the cache can be shared between threads
+    """
+
+    def __init__(s, maxsize=4096):
+        s.maxsize = maxsize
+        s._entries = OrderedDict()
+        s._lock = threading.Lock()
+        s.hits = 0
+        s.misses = 0
+
+    def get(s, key, compute):
+        """
+        returns the cached result for `key`, or computes and caches it
+
+        :key:           the cache key
+        :compute:       function() computing the result (exceptions are not cached)
+        """
+        try:
+            with s._lock:
+                result = s._entries[key]
+                s._entries.move_to_end(key)
+                s.hits += 1
+                return result
+        except (KeyError, TypeError):
+            pass
+        result = compute()
+        with s._lock:
+            s.misses += 1
+            if s.maxsize <= 0: return result
+            try: s._entries[key] = result
+            except TypeError: return result
+            if len(s._entries) > s.maxsize: s._entries.popitem(last=False)
+        return result
+
+    def __contains__(s, key):
+        """
+        whether `key` is cached (not counted as a hit or miss)
+        """
+        try: return key in s._entries
+        except TypeError: return False
+
+    def clear(s):
+        """
+        removes all entries, and resets the counters
+        """
+        with s._lock:
+            s._entries.clear()
+            s.hits = 0
+            s.misses = 0
+
+    def __len__(s):
+        return len(s._entries)
+
+
+
 
 ########################################################################################
 ## CLASS PAGE BUILDER
@@ -422,11 +585,17 @@ class PageBuilder():
         "_removeComments":              True,       # filter: remove comments
         "_removeLineComments":          False,      # filter: remove line comments
         "_extractReferences":           True,       # analyser: extract references (ie URLs)
+        "_filterCacheSize":             4096,       # field filter results cached (see `FilterCache`)
         #"_definitionsOnly":            False,
     }
 
     def __init__(s, **kwargs):
         s.p = {} # parameter
+        s._kwargs = dict(kwargs)
+            # kept so that an equivalent builder can be created elsewhere,
+            # eg in the worker processes of `PageBuilderMain` (together with
+            # the parameters changed later on, see `updateParameters`)
+        s._updates = {}
 
         # read the paramters from kwargs or, if not present there, from _default_parameters
         for param, value in s._default_parameters.items():
@@ -449,6 +618,15 @@ class PageBuilder():
             for k,v in kwargs["_data"].items():
                 s.p[k] = v
 
+        # compile the templates
+        s._templates = {}           # parameter name: Template
+        s._inlineTemplates = FilterCache(s._INLINETEMPLATES)
+            # template source: Template (for :_sectiontemplate:); bounded, as
+            # every edit of the template adds an entry when watching the files
+        s._compileTemplates()
+        s._renderedStyle = None     # memoized by `_style`
+        s.filterCache = FilterCache(s.p['_filterCacheSize'])
+
 
         s._parse = mm.Parser(
                         fieldParsers            = s._fieldParsers,
@@ -472,10 +650,19 @@ class PageBuilder():
                           use `**{n1:v1, n2:v2}` to pass dicts
         """
         for param, value in kwargs.items():
-            if not param in s._parameters:
+            if not param in s.p:
                 pass
                 #raise ValueError("Unknown parameter", param, tuple(s.p.keys()))
             s.p[param] = value
+        s._updates.update(kwargs)
+
+        # recompile the templates that have been changed
+        s._compileTemplates(name for name in kwargs if name in s._templates)
+
+        # invalidate the rendered style if the style or one of its fields changed
+        style = s._templates.get("_style", None)
+        if style is None or any(name == "_style" or name in style.defaults for name in kwargs):
+            s._renderedStyle = None
 
     @staticmethod
     def _processSectionTemplates(sectionTemplates):
@@ -526,9 +713,9 @@ class PageBuilder():
 
     def _processMetaMarkdown(s, md, createHtml=True):
         """
-        processes one markdown file
+        processes one markdown file (with the link references from the settings)
         """
-        result = s._parse(md, createHtml=createHtml)
+        result = s._parse(md, createHtml=createHtml, references=s._settings_references)
         #print("ANALYSIS PB", result.analysis)
         return result
             # because this gets a bit confusing:
@@ -578,53 +765,87 @@ class PageBuilder():
                 print(error)
                 return("<pre>"+error+"</pre>")
 
-        # process the :defaults: tag (which for an inline template is a tag in a tag ¯\_(ツ)_/¯)
-        parser = lambda str1: mm.parse_dict(str1, sep=DICTSEP)
-        result = mm.parsetext(template, fieldParsers={"defaults": parser})
-        template = result.body
+        # the compiled template (its :defaults: tag is parsed on compilation)
+        template = s._compiledTemplate(_template_name, template)
 
         # overwrite the parameters in the template with those in s.p if defined there
         # (this is particularly how parameters defined in the _DATA files get included,
         # and this also makes that parameters that are only present in `s.p` but not
         # here via :defaults: will NOT be considered)
-        params = result.meta.get("defaults", {})
-        #if params is None: params = {}
-        params = {
+        defaults = {
             k: s.p[k] if k in s.p else v
-            for k,v in params.items()
+            for k,v in template.defaults.items()
         }
 
         # overwrite / amend the parameters from the page-specific paramters
-        params.update(specific_params)
+        # (the parameters are chained rather than copied into one dict: the
+        # template only looks up the fields it uses)
+        params = ChainMap(specific_params, defaults)
 
         # include the page-specific parameters from the data file
         try:
             file_params = s.p["_select"][params["_filename"]]
             #print("FILE SPECIFIC PARAMS", params["_filename"], len(file_params))
-            params.update(file_params)
+            params = params.new_child(dict(file_params))
         except:
             pass
 
 
 
         # finally apply the parameters to the template
-        if params:
-            try:
-                template = template.format(**params)
-            except KeyError as e:
-                error = _removeIndent("""
-                ==============
-                TEMPLATE ERROR
-                ==============
-                file:       {}
-                template:   {}
-                missing:    {}
-                defined:    {}
-                """).format(params['_filename'], _template_name, e, tuple(params.keys()))
-                print(error)
-                template = "<pre>"+error+"</pre>"
+        if not params:
+            return template.body
+        try:
+            template = template.render(params)
+        except KeyError as e:
+            error = _removeIndent("""
+            ==============
+            TEMPLATE ERROR
+            ==============
+            file:       {}
+            template:   {}
+            missing:    {}
+            defined:    {}
+            """).format(params['_filename'], _template_name, e, tuple(params.keys()))
+            print(error)
+            template = "<pre>"+error+"</pre>"
+        return template
+
+    def _compiledTemplate(s, name, source):
+        """
+        returns the compiled template for `source`
+
+        :name:      the key of the template in `s.p` ("==LOCAL==" for inline templates)
+        :source:    the template source string
+        :returns:   the `Template` object (compiled on first use for inline
+                    templates, or if `s.p` has been modified directly)
+        """
+        if name == "==LOCAL==":
+            return s._inlineTemplates.get(source, lambda: Template(source))
+        template = s._templates.get(name, None)
+        if template is None or template.source != source:
+            template = s._templates[name] = Template(source)
         return template
 
+    _INLINETEMPLATES = 256
+        # the number of inline templates kept compiled (least recently used are evicted)
+
+    def _compileTemplates(s, names=None):
+        """
+        compiles the templates in `s.p`
+
+        :names:     iterable of the parameter names to (re)compile; if None, all
+                    templates are compiled (page, style and section templates)
+        """
+        if names is None:
+            names = ["_template", "_style"] + ["_sectiontemplate_"+n for n in s.p['_sectiontemplatenames']]
+        for name in names:
+            source = s.p.get(name, None)
+            if isinstance(source, str):
+                s._templates[name] = Template(source)
+            else:
+                s._templates.pop(name, None)
+
     def _readSettings(s, settings):
         """
         process the settings file (overwrites current settings)
@@ -633,6 +854,7 @@ class PageBuilder():
         """
         s._settings_body = ""
         s._settings_meta = {}
+        s._settings_references = {}
         processed = mm.Parser(
                         fieldParsers=s._fieldParsers,
                         filters = {
@@ -643,11 +865,25 @@ class PageBuilder():
                         analysers = {
                             'extractReferences':    True,
                         }
-                        )(settings)
+                        )(settings, createHtml=False)
         processed.meta["_analysis"] = processed.analysis
 
         s._settings_body        = processed.body
         s._settings_meta        = processed.meta
+        s._settings             = LayeredDict([processed.meta])
+        s._settingsFilters      = s._filterSettings()
+
+        # the settings body (ie the link definitions) used to be appended to
+        # every file; instead it is filtered, analysed and parsed for link
+        # references once here, and the results are added to every file
+        body = s._parse._applyFilters(processed.body)
+        s._settings_body_filtered   = body
+        s._settings_analysis        = s._parse._applyAnalysers(body)
+        s._settings_references      = mm.markdown_references("\n\n".join(body.split("\n")))
+            # after `definitionsOnly` every line is a complete link definition;
+            # in a single block markdown's reference processor rescans the
+            # rest of the block for every definition (ie quadratic), whereas
+            # one block per line gives the same references in linear time
 
     @property
     def _style(s):
@@ -655,26 +891,107 @@ class PageBuilder():
         processes the internal style template
 
         :returns:   the style to be used with all parameters resolved
+
+        the result only depends on `s.p`, so it is rendered once and then
+        memoized until `updateParameters` changes the style template or one
+        of the fields in its :defaults: (changes made directly to `s.p` are
+        not detected)
         """
-        return s._processTemplate("_style")
+        if s._renderedStyle is None:
+            s._renderedStyle = s._processTemplate("_style")
+        return s._renderedStyle
 
-    def _template(s, **params):
+    def _template(s, params):
         """
         processes the full-page template, returning a complete page including <html>, <head> and <body> tags
 
-        :params:    keyword arguments corresponding to the fields the
-                    template expect to be filled from the file data,
-                    such as body text and style
+        :params:    mapping of the fields the template expects to be filled
+                    from the file data, such as body text and style
         :returns:   the final page HTML including <html>, <head> and <body> tags
         """
         return s._processTemplate("_template", params)
 
-    def applyFilters(s, params):
+    _HTMLFILTERS = {"md", "pre", "div", "tbl", "tbltd", "tblh", "tblv", "now"}
+        # the filters whose result is also stored as `field_html`
+
+    def _filter(s, filter, field, value, markdown=None):
+        """
+        applies a single field filter (see `applyFilters`)
+
+        :filter:        the filter name, eg "md"
+        :field:         the field name (used for the html class)
+        :value:         the raw field value
+        :markdown:      dict value: html of markdown values already converted
+                        (with `mm.parse_markdown_batch`)
+        :returns:       the filtered value
+        """
+        # markdown filter -> convert from markdown, wrap in div
+        if filter == "md":
+            html = markdown.get(value) if markdown and isinstance(value, str) else None
+            if html is None: html = mm.parse_markdown(value)
+            return "<div class='ff ff-md ff-{1}'>{0}</div>".format(html, field)
+
+        # pre filter -> wrap in pre
+        elif filter == "pre":
+            return "<pre class='ff ff-pre ff-{1}'>{0}</pre>".format(value, field)
+
+        # pre filter -> wrap in div
+        elif filter == "div":
+            return "<div class='ff ff-div ff-{1}'>{0}</div>".format(value, field)
+
+        # dict filter -> interpret as (ordered) dict
+        elif filter == "dct":
+            return mm.parse_dict(value, sep=DICTSEP)
+
+        # lines filter -> split string by lines
+        elif filter == "ln":
+            return mm.parse_lines(value)
+
+        # csv filter -> split at commas (tuple)
+        elif filter == "csv":
+            return mm.parse_csv(value)
+
+        # tbl filter -> split at commas, render as html table (1st row and col th)
+        elif filter == "tbl":
+            return mm.parse_table_html(value, first_row_th=True, first_col_th=True, cls=field)
+
+        # tbl filter -> split at commas, render as html table (only td)
+        elif filter == "tbltd":
+            return mm.parse_table_html(value, first_row_th=False, first_col_th=False, cls=field)
+
+        # tblh filter -> split at commas, render as horizontal html table (1st row th)
+        elif filter == "tblh":
+            return mm.parse_table_html(value, first_row_th=True, first_col_th=False, cls=field)
+
+        # tblv filter -> split at commas, render as vertical html table (1st col th)
+        elif filter == "tblv":
+            return mm.parse_table_html(value, first_row_th=False, first_col_th=True, cls=field)
+
+        # brk filter -> preserve (double) line breaks
+        elif filter == "brk":
+            return mm.parse_breaks(value)
+
+        # now filter -> expects format string, returns current time
+        elif filter == "now":
+            return mm.parse_now(value)
+
+        else:
+            raise RuntimeError("Unkown filter '{}'".format(filter))
+
+    def applyFilters(s, params, layers=None):
         """
         applies filters to all fields of form 'name|filter'
 
         :params:        all template parameters
-        :returns:       new parameter dict with filters applied
+        :layers:        tuple(below, top) if `params` is `s._settings.over(top, below=below)`;
+                        the results of the settings fields are then taken from
+                        `s._settingsFilters` (see `_filterSettings`), and only the
+                        fields of `below` and `top` are filtered
+        :returns:       `params`, with the filters applied
+
+        the filter results are cached in `s.filterCache` (see `FilterCache`),
+        except for the `now` filter, and the markdown fields that are not cached
+        are converted together (see `mm.parse_markdown_batch`)
 
         EXAMPLE
 
@@ -684,8 +1001,71 @@ class PageBuilder():
                 'f1':       '<p>lorem <em>ipsum</em></p>', # markdown expanded
             }
         """
-        params1 = {} # can't update the paramter dict during iteration
-        for k,v in params.items():
+        settings = s._settingsFilters
+        if layers is not None and settings is not None:
+            below, top = layers
+            if not s._settings.overlaps(below) and \
+                    not any(top[k] is None for k in top if k in settings.order):
+                # the fields are filtered in the order of `params` (below, settings,
+                # top), skipping the settings fields whose value did not change
+                keysBelow = [k for k in below if k in params]
+                keysSettings = sorted(set(settings.dynamic).union(k for k in top if k in settings.order),
+                                key=settings.order.__getitem__)
+                keysTop = [k for k in top if k in params and not k in below and not k in settings.order]
+                markdown = s._markdownBatch(params, keysBelow + keysSettings + keysTop)
+                errors = []
+                params1Below = s._filterFields(params, keysBelow, markdown, errors)
+                params1Settings = s._filterFields(params, keysSettings, markdown, errors)
+                params1Top = s._filterFields(params, keysTop, markdown, errors)
+                if set(params1Settings) == set().union(*(settings.names[k] for k in keysSettings)):
+                    for message in errors: print(message)
+                    params.update(params1Below)
+                    params.update(settings.params1)
+                    params.update(params1Settings)
+                    params.update(params1Top)
+                    return params
+                # a filter failed on a new value of a settings field, so the
+                # fields set are not those of the settings value: filter all
+
+        errors = []
+        params1 = s._filterFields(params, list(params), s._markdownBatch(params, params), errors)
+            # can't update the paramter dict during iteration
+        for message in errors: print(message)
+        params.update(params1)
+        return params
+
+    def _markdownBatch(s, params, keys):
+        """
+        converts the markdown fields among `keys` in a single pass (see `applyFilters`)
+
+        :returns:       dict value: html, or None
+        """
+        # the markdown fields are converted in a single pass, except for those
+        # that are cached (the results are the same as one field at a time)
+        markdown = dict.fromkeys(
+            params[k] for k in keys
+            if k.endswith("|md") and k.count("|") == 1 and isinstance(params[k], str)
+            and not ("md", k[:-3], params[k]) in s.filterCache
+        )
+        try:
+            return dict(zip(markdown, mm.parse_markdown_batch(markdown))) if len(markdown) > 1 else None
+        except Exception:
+            return None
+                # the fields are converted one by one, and the errors reported there
+
+    def _filterFields(s, params, keys, markdown, errors):
+        """
+        the fields created by the filters of the fields `keys` (see `applyFilters`)
+
+        :params:        all template parameters
+        :keys:          the fields to be filtered, in this order
+        :markdown:      as returned by `_markdownBatch`
+        :errors:        list the error messages are appended to
+        :returns:       dict of the fields created (applied to `params` with `update`)
+        """
+        params1 = {}
+        for k in keys:
+            v = params[k]
 
             try:
                 try:
@@ -706,187 +1086,1161 @@ class PageBuilder():
                 #
                 params1[field] = v
 
-                # markdown filter -> convert from markdown, wrap in div
-                if filter == "md":
-                    params1[k] = \
-                        "<div class='ff ff-md ff-{1}'>{0}</div>".format(mm.parse_markdown(v),k[0:-3])
+                # the results only depend on (filter, field, value), so they are
+                # cached (except for the now filter, which depends on the time)
+                if filter == "now":
+                    params1[k] = s._filter(filter, field, v)
+                else:
+                    params1[k] = s.filterCache.get((filter, field, v), lambda: s._filter(filter, field, v, markdown))
+                    if isinstance(params1[k], dict): params1[k] = copy(params1[k])
+                        # the cached dicts are shared between the files
+                if filter in s._HTMLFILTERS:
                     params1[field+"_html"] = params1[k]
 
-                # pre filter -> wrap in pre
-                elif filter == "pre":
-                    params1[k] = \
-                        "<pre class='ff ff-pre ff-{1}'>{0}</pre>".format(v, k[0:-4])
-                    params1[field+"_html"] = params1[k]
+            except BaseException as e:
+                #raise
+                message = _removeIndent("""
+                ============
+                FILTER ERROR
+                ============
+                file:       {}
+                field:      {}
+                value:      {}
+                error:      {}
+                """).format(params['_filename'], k, v, e)
+                errors.append(message)
+                params1[field] = "<pre>"+message+"</pre>"
 
-                # pre filter -> wrap in div
-                elif filter == "div":
-                    params1[k] = \
-                        "<div class='ff ff-div ff-{1}'>{0}</div>".format(v, k[0:-4])
-                    params1[field+"_html"] = params1[k]
+        return params1
 
-                # dict filter -> interpret as (ordered) dict
-                elif filter == "dct":
-                    #dct = mm.parse_dict(v, sep=DICTSEP)
-                    #dct = {k:v for k,v in dct.items()}
-                    #params1[field] = dct
-                    params1[k] = mm.parse_dict(v, sep=DICTSEP)
-
-                # lines filter -> split string by lines
-                elif filter == "ln":
-                    params1[k] = mm.parse_lines(v)
-
-                # csv filter -> split at commas (tuple)
-                elif filter == "csv":
-                    params1[k] = mm.parse_csv(v)
-
-                # tbl filter -> split at commas, render as html table (1st row and col th)
-                elif filter == "tbl":
-                    params1[k] = mm.parse_table_html(v,
-                            first_row_th=True, first_col_th=True, cls=field)
-                    params1[field+"_html"] = params1[k]
+    _SettingsFilters = namedtuple("_SettingsFilters", "order names params1 dynamic")
+        # the filtered settings fields (see `_filterSettings`)
+        # :order:       dict field: position in the settings
+        # :names:       dict field: the names of the fields its filter creates
+        # :params1:     the fields created by the filters of all settings fields
+        # :dynamic:     the fields that are filtered again for every file
 
-                # tbl filter -> split at commas, render as html table (only td)
-                elif filter == "tbltd":
-                    params1[k] = mm.parse_table_html(v,
-                            first_row_th=False, first_col_th=False, cls=field)
-                    params1[field+"_html"] = params1[k]
+    def _filterSettings(s):
+        """
+        applies the filters to the settings fields once (see `applyFilters`)
 
-                # tblh filter -> split at commas, render as horizontal html table (1st row th)
-                elif filter == "tblh":
-                    params1[k] = mm.parse_table_html(v,
-                            first_row_th=True, first_col_th=False, cls=field)
-                    params1[field+"_html"] = params1[k]
+        :returns:       `_SettingsFilters`, or None if the filters of two settings
+                        fields create the same field (the order in which they are
+                        applied then matters, and all fields are filtered per file)
 
-                # tblv filter -> split at commas, render as vertical html table (1st col th)
-                elif filter == "tblv":
-                    params1[k] = mm.parse_table_html(v,
-                            first_row_th=False, first_col_th=True, cls=field)
-                    params1[field+"_html"] = params1[k]
+        the fields are filtered again for every file if their value is a dict (it
+        is copied for every file), if the result is a dict, if the filter is `now`,
+        or if the filter fails (the error is reported with the file name)
+        """
+        order, names, params1, dynamic = {}, {}, {}, []
+        settings = ChainMap(s._settings, {'_filename': None})
+            # for the error messages, which are discarded
+        for i, (k, v) in enumerate(s._settings.items()):
+            errors = []
+            fields = s._filterFields(settings, [k], None, errors)
+            if not set(fields).isdisjoint(params1): return None
+            order[k] = i
+            names[k] = frozenset(fields)
+            params1.update(fields)
+            if errors or isinstance(v, dict) or k.endswith("|now") \
+                    or any(isinstance(value, dict) for value in fields.values()):
+                dynamic.append(k)
+        return s._SettingsFilters(order, names, params1, tuple(dynamic))
+
+    def _sectionTemplate(s, params):
+        """
+        processes section template, returning the html for the section
+
+        :params:    mapping of the fields the template expects to be
+                    filled from the file data
+        :returns:   the section html
+        """
+        sectionTemplateName = params.get("sectiontemplate", "default")
+        sectionTemplateName = "_sectiontemplate_"+sectionTemplateName.strip()
+            # params['_sectiontemplate'] contains the (short) name of the template
+            # this is prepended with "_sectiontemplate_" to get the key under which it is stored
+            # eg the default template will be under "_sectiontemplate_default"
+
+        # process all meta data fields, applying filters
+        # for example :fieldname|md: applies the markdown filter to the contents
+        # of the field, and stores the result as :fieldname:
+
+        return s._processTemplate(sectionTemplateName, params)
+
+    def createHtmlPageFromHtmlAndMeta(s, bodyHtml, meta=None):
+        """
+        creates an entire HtmlPage based on the bodyHtml and meta data
+        """
+        if meta is None: meta = {}
+        #print(meta)
+
+        title = meta.get("title", "")
+        metaTags = (
+                s.p['meta'].format(field=field, value=value)
+                for field, value in meta.get("_meta", {}).items()
+        )
+
+        return s._template(ChainMap({
+            "body":         bodyHtml,
+            "metatags":     "\n".join(metaTags),   # that's html meta tags
+            "style":        s._style,
+        }, meta))                                   # that's meta data that might be rendered
+
+    _BODYSENTINEL = "\x00pagebuilder:body\x00"
+
+    def createHtmlPageParts(s, meta=None):
+        """
+        the entire HtmlPage for the meta data, split around the body html
+
+        :meta:          the meta data (as for `createHtmlPageFromHtmlAndMeta`)
+        :returns:       tuple(head, tail) so that `head + bodyHtml + tail` is the page,
+                        or None if the page template does not allow splitting (eg
+                        because `{body}` is used more than once or with a format spec)
+
+        USAGE
+
+            parts = builder.createHtmlPageParts(meta)
+            if parts is not None:
+                head, tail = parts
+                f.write(head)
+                for section in sections: f.write(section)
+                f.write(tail)
+        """
+        template = s._templates.get("_template", None)
+        if template is None or template.fields is None: return None
+        bodyFields = [
+            (field, spec, conversion)
+            for _, field, spec, conversion in Formatter().parse(template.body)
+            if field is not None and re.split(r"[.\[]", field, maxsplit=1)[0] == "body"
+        ]
+        if bodyFields != [("body", "", None)]: return None
+        parts = s.createHtmlPageFromHtmlAndMeta(s._BODYSENTINEL, meta).split(s._BODYSENTINEL)
+        if len(parts) != 2: return None
+        return tuple(parts)
+
+    _MMD = namedtuple("mmdData", "pageHtml sectionHtml metaData metaDataRaw")
+
+    def createHtmlPageFromMetaMarkdown(s, metaMarkdown, **additionalMeta):
+        """
+        creates an entire HtmlPage based on the meta markdown
+
+        :metaMarkdown:      the metaMarkdown data
+        :additionalMeta:    additional parameters to be added to the meta data
+        :returns:           Namedtuple(html, innerHtml, metaData, metaDataRaw)
+
+        this is `parseMetaMarkdown` followed by `renderMetaMarkdown`; the time
+        spent is recorded per file in `timings` (if enabled)
+        """
+        with timings.file(additionalMeta.get("_filename", "")):
+            return s.renderMetaMarkdown(*s.parseMetaMarkdown(metaMarkdown, **additionalMeta))
+
+    def parseMetaMarkdown(s, metaMarkdown, createHtml=True, **additionalMeta):
+        """
+        the parse stage of `createHtmlPageFromMetaMarkdown` (everything but the templates)
+
+        :metaMarkdown:      the metaMarkdown data
+        :createHtml:        if False, the body is not converted to html (`processed.html`
+                            is None, and the result can not be rendered)
+        :additionalMeta:    additional parameters to be added to the meta data
+        :returns:           tuple(processed, metaData)
+        :processed:         the parser result (meta, analysis, body, html), including
+                            the settings body and analysis
+        :metaData:          the combined meta data, with the field filters applied
+
+        the result does not depend on the data parameters (eg `_select`), so it
+        can be rendered again after they changed (see `PageBuilderMain.run`)
+        """
+
+        # process the meta markdown file with the settings links
+        processed = s._processMetaMarkdown(metaMarkdown, createHtml=createHtml)
+
+        # add the settings body and its analysis, as if it had been appended to the file
+        # (in a file without body, leading blank lines would have been part of the last tag)
+        if processed.body or not processed.meta:
+            processed.body += s._settings_body_filtered
+        else:
+            processed.body = s._settings_body_filtered.lstrip("\n")
+        analysis = processed.analysis
+        for k, v in s._settings_analysis.items():
+            analysis[k] = analysis[k] + v if k in analysis else v
+        #print("ANALYSIS PB2", analysis)
+
+        # combine the meta data (processed > settings > additional)
+        with timings.stage("build.contract"):
+            metaData = s._settings.over(processed.meta, below=additionalMeta)
+
+        # apply filters (the settings fields are filtered once, in `_readSettings`)
+        with timings.stage("build.applyFilters"):
+            metaData = s.applyFilters(metaData, (additionalMeta, processed.meta))
+
+        return processed, metaData
+
+    def renderMetaMarkdown(s, processed, metaData):
+        """
+        the template stage of `createHtmlPageFromMetaMarkdown`
+
+        :processed:         as returned by `parseMetaMarkdown`
+        :metaData:          as returned by `parseMetaMarkdown` (this dict is modified)
+        :returns:           Namedtuple(html, innerHtml, metaData, metaDataRaw)
+        """
+
+        # apply the section template
+        with timings.stage("build.sectiontemplate"):
+            sectionHtml = s._sectionTemplate(ChainMap({"body": processed.html}, metaData))
+
+        # apply the main template
+        with timings.stage("build.pagetemplate"):
+            html = s.createHtmlPageFromHtmlAndMeta(bodyHtml=sectionHtml, meta=metaData)
+
+        # return the results
+        metaData['_body'] = processed.body
+        metaData['_analysis'] = processed.analysis
+            # also store the body as a meta data field
+            # TODO: should this happen in the meta markdown class?
+        return s._MMD(html, sectionHtml, metaData, processed.meta)
+
+    def __call__(s, *args, **kwargs):
+        """
+        alias for `createHtmlPageFromMetaMarkdown`
+        """
+        return s.createHtmlPageFromMetaMarkdown(*args, **kwargs)
+
+
+pagebuilder = PageBuilder()
+
+
+
+########################################################################################
+## CLASS BUILD MANIFEST
+
+import io
+import hashlib
+import pickle
+
+class BuildManifest():
+    """
+    on-disk cache of the per-file conversion results, keyed by content hash
+
+    :filename:      the file where the manifest is stored
+    :config:        iterable of everything that affects the output of every
+                    file (templates, style, settings, data...); if any of
+                    those changes, all cached results are invalidated
+
+    USAGE
+
+        manifest = BuildManifest(".pagebuilder-manifest", config).load()
+        key = manifest.key(fn, contents)
+        result = manifest.get(fn, key)
+        if result is None:
+            result = builder(contents, ...)
+            manifest.put(fn, key, result)
+        ...
+        manifest.save()
+
+    NOTES
+    - results are pickled when they are put into the manifest, so later
+      modifications of the meta data dicts do not leak into the cache
+    - the file is JSON, with the results as YAML text (read with the safe
+      loader of `Serializer`), so loading a manifest can not execute code;
+      pickled results never leave the process
+    - results containing a `|now` field are never cached, because they
+      depend on the time of the conversion
+    """
+
+    def __init__(s, filename, config=None):
+        s.filename      = filename
+        s.configHash    = s.hash(__version__, mm.__version__, *(config or ()))
+        s.entries       = {}    # filename: (key, pickled result, or YAML text if loaded)
+        s.hits          = 0
+        s.misses        = 0
+        s._serializer   = Serializer(output=Serializer.JSON, input=Serializer.JSON, safe=True)
+
+    @staticmethod
+    def hash(*items):
+        """
+        hash of the repr of all items
+
+        :items:     the items to be hashed (str, or anything with a stable repr)
+        :returns:   the hex digest
+        """
+        h = hashlib.sha256()
+        for item in items:
+            if not isinstance(item, str): item = repr(item)
+            h.update(item.encode())
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def load(s):
+        """
+        loads the manifest from disk (entries with a different config are discarded)
+
+        :returns:   self
+        """
+        try:
+            with open(s.filename, "rb") as f: data = s._serializer.reads(f.read())
+            if data.get("config") == s.configHash:
+                s.entries = {fn: (key, result) for fn, (key, result) in data.get("entries", {}).items()
+                                if isinstance(key, str) and isinstance(result, str)}
+        except (FileNotFoundError, Serializer.DeserializationError, AttributeError, TypeError, ValueError):
+            s.entries = {}
+        return s
+
+    def save(s):
+        """
+        saves the manifest to disk
+        """
+        entries = {fn: (key, result if isinstance(result, str) else s._yaml(pickle.loads(result)))
+                        for fn, (key, result) in s.entries.items()}
+        s.entries.update(entries)
+            # the YAML text is kept, so unchanged entries are only converted once
+        with open(s.filename, "w") as f:
+            f.write(s._serializer.writes({"config": s.configHash, "entries": entries}))
+
+    @staticmethod
+    def _yaml(result):
+        """
+        the YAML text of a result tuple (the keys of the dicts stay in order)
+        """
+        f = io.StringIO()
+        _writeYAML(f, result, sort_keys=False)
+        return f.getvalue()
+
+    def _result(s, result):
+        """
+        the result tuple of an entry (None if a loaded entry can not be read)
+        """
+        if not isinstance(result, str): return pickle.loads(result)
+        try:
+            return tuple(s._serializer.reads(result, input=Serializer.YAML))
+        except (Serializer.DeserializationError, TypeError):
+            return None
+
+    def reconfigure(s, config=None, keep=None):
+        """
+        changes the config of a manifest that is kept in memory
+
+        :config:        the new config (see `__init__`)
+        :keep:          if given, a function `keep(result)` that returns True for
+                        the cached results that are not affected by the change;
+                        all other entries are discarded (default: all)
+        :returns:       self
+        """
+        s.configHash = s.hash(__version__, mm.__version__, *(config or ()))
+        if keep is None:
+            s.entries = {}
+        else:
+            results = ((fn, entry, s._result(entry[1])) for fn, entry in s.entries.items())
+            s.entries = {fn: entry for fn, entry, result in results if result is not None and keep(result)}
+        return s
+
+    def key(s, fn, contents):
+        """
+        the cache key for a file
+
+        :fn:            the file name (it ends up in the meta data)
+        :contents:      the file contents
+        :returns:       the key
+
+        NOTE: the key does not depend on the config; entries with a different
+        config are discarded by `load` and `reconfigure` instead
+        """
+        return s.hash(fn, contents)
+
+    def get(s, fn, key):
+        """
+        returns the cached result for `fn` if the key matches, None otherwise
+        """
+        try:
+            stored_key, result = s.entries[fn]
+        except KeyError:
+            s.misses += 1
+            return None
+        if stored_key != key:
+            s.misses += 1
+            return None
+        result = s._result(result)
+        if result is None:
+            del s.entries[fn]
+            s.misses += 1
+            return None
+        s.hits += 1
+        return result
+
+    def put(s, fn, key, result):
+        """
+        stores the result for `fn` under `key`
+
+        :result:    the result tuple (html, innerHtml, metaData, metaDataRaw)
+        """
+        meta = result[2]
+        if any(k.endswith("|now") for k in meta):
+            s.entries.pop(fn, None)
+            return
+        s.entries[fn] = (key, pickle.dumps(tuple(result)))
+
+
+
+########################################################################################
+## CLASS WATCHER
+
+import os
+import time
+import select
+import traceback
+import ctypes
+import ctypes.util
+
+class Watcher():
+    """
+    waits for changes of a set of files
+
+    :filenames:     the files to be watched (they do not need to exist)
+    :interval:      the polling interval in seconds
+
+    changes are detected by comparing the modification time and size of the
+    files; where inotify is available (Linux) it is only used to wake up as
+    soon as something in one of the directories changed, otherwise the files
+    are polled every `interval` seconds
+
+    USAGE
+
+        watcher = Watcher(["a.md", "b.md", "_SETTINGS"])
+        while True:
+            changed = watcher.wait()        # eg {"a.md"}
+            ...
+    """
+
+    IN_MODIFY       = 0x00000002
+    IN_ATTRIB       = 0x00000004
+    IN_CLOSE_WRITE  = 0x00000008
+    IN_MOVED_FROM   = 0x00000040
+    IN_MOVED_TO     = 0x00000080
+    IN_CREATE       = 0x00000100
+    IN_DELETE       = 0x00000200
+    IN_MASK         = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | \
+                      IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    SETTLE          = 0.05  # seconds to wait after a wakeup (editors write in steps)
+
+    def __init__(s, filenames, interval=0.5):
+        s.filenames     = list(filenames)
+        s.interval      = interval
+        s.state         = s.snapshot()
+        s._fd           = s._inotify(set(os.path.dirname(fn) or "." for fn in s.filenames))
+
+    def _inotify(s, dirnames):
+        """
+        sets up an inotify watch on the directories
+
+        :returns:       the inotify file descriptor, or None if not available
+        """
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0: return None
+        for dirname in dirnames:
+            if libc.inotify_add_watch(fd, os.fsencode(dirname), s.IN_MASK) < 0:
+                os.close(fd)
+                return None
+        return fd
+
+    def snapshot(s):
+        """
+        the current state of the watched files
+
+        :returns:       dict filename: (mtime, size) or None if the file does not exist
+        """
+        state = {}
+        for fn in s.filenames:
+            try:
+                st = os.stat(fn)
+                state[fn] = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                state[fn] = None
+        return state
+
+    def wait(s):
+        """
+        blocks until at least one of the watched files changed
+
+        :returns:       the set of files that changed
+        """
+        while True:
+            if s._fd is None:
+                time.sleep(s.interval)
+            elif select.select([s._fd], [], [], s.interval)[0]:
+                time.sleep(s.SETTLE)
+                try:
+                    while os.read(s._fd, 65536): pass
+                except BlockingIOError:
+                    pass
+            state = s.snapshot()
+            changed = set(fn for fn in s.filenames if state[fn] != s.state[fn])
+            s.state = state
+            if changed: return changed
+
+    def close(s):
+        """
+        releases the inotify file descriptor
+        """
+        if s._fd is not None: os.close(s._fd)
+        s._fd = None
+
+
+########################################################################################
+## CLASS HTTP REQUEST HANDLER
+
+import http.server as hs
+import email.utils
+import urllib.parse
+import threading
+import io
+
+class CachingHTTPRequestHandler(hs.SimpleHTTPRequestHandler):
+    """
+    request handler for `runServer`, serving files from the current directory
+
+    compared to `SimpleHTTPRequestHandler` it
+
+    - sends an `ETag` (and `Last-Modified`) and answers conditional requests
+      (`If-None-Match`, `If-Modified-Since`) with 304
+    - keeps small files in an in-memory cache that is shared by all threads,
+      bounded by `CACHESIZE` bytes (least recently used files are evicted
+      first); entries are validated against the file's ETag, so files that
+      are regenerated (eg by `--watch`) are picked up immediately
+    - sends files larger than `CACHEMAXITEM` with `socket.sendfile`
+
+    USAGE
+
+        PageBuilderMain().runServer(8000, handler=CachingHTTPRequestHandler)
+    """
+    CACHESIZE       = 32*1024*1024
+    CACHEMAXITEM    = 1024*1024
+
+    _cache          = OrderedDict()     # path: (etag, body)
+    _cacheBytes     = 0
+    _cacheLock      = threading.Lock()
+
+    @classmethod
+    def _cacheGet(cls, path, etag):
+        """
+        returns the cached body of `path` if it is still valid, None otherwise
+        """
+        with cls._cacheLock:
+            entry = cls._cache.get(path)
+            if entry is None or entry[0] != etag: return None
+            cls._cache.move_to_end(path)
+            return entry[1]
+
+    @classmethod
+    def _cachePut(cls, path, etag, body):
+        """
+        stores the body of `path` in the cache, evicting old entries as needed
+        """
+        with cls._cacheLock:
+            old = cls._cache.pop(path, None)
+            if old is not None: cls._cacheBytes -= len(old[1])
+            cls._cache[path] = (etag, body)
+            cls._cacheBytes += len(body)
+            while cls._cacheBytes > cls.CACHESIZE:
+                _, (_, evicted) = cls._cache.popitem(last=False)
+                cls._cacheBytes -= len(evicted)
+
+    def _notModified(s, etag, mtime):
+        """
+        True if the conditional request headers match the file
+
+        :etag:          the current ETag
+        :mtime:         the modification time (None if not applicable)
+        """
+        inm = s.headers.get("If-None-Match")
+        if inm is not None:
+            return inm.strip() == "*" or etag in (tag.strip() for tag in inm.split(","))
+        ims = s.headers.get("If-Modified-Since")
+        if ims is not None and mtime is not None:
+            try:
+                return int(mtime) <= email.utils.parsedate_to_datetime(ims).timestamp()
+            except (TypeError, ValueError, IndexError, OverflowError):
+                return False
+        return False
+
+    def send_head(s):
+        """
+        common code for GET and HEAD (see `SimpleHTTPRequestHandler.send_head`)
+
+        :returns:       a file object to be copied to the output, or None
+        """
+        path = s.translate_path(s.path)
+        if os.path.isdir(path) or path.endswith("/"):
+            return super().send_head()
+        try:
+            f = open(path, "rb")
+        except OSError:
+            s.send_error(hs.HTTPStatus.NOT_FOUND, "File not found")
+            return None
+        try:
+            st = os.fstat(f.fileno())
+            etag = '"{:x}-{:x}"'.format(st.st_mtime_ns, st.st_size)
+            if s._notModified(etag, st.st_mtime):
+                f.close()
+                s.send_response(hs.HTTPStatus.NOT_MODIFIED)
+                s.send_header("ETag", etag)
+                s.end_headers()
+                return None
+
+            length = st.st_size
+            if st.st_size <= s.CACHEMAXITEM:
+                body = s._cacheGet(path, etag)
+                if body is None:
+                    body = f.read()
+                    if len(body) != st.st_size:
+                        # the file changed after `fstat` (eg rewritten by `--watch`)
+                        st = os.fstat(f.fileno())
+                        etag = '"{:x}-{:x}"'.format(st.st_mtime_ns, st.st_size)
+                    if len(body) == st.st_size: s._cachePut(path, etag, body)
+                f.close()
+                f = io.BytesIO(body)
+                length = len(body)
+            s._sendLength = length
+
+            s.send_response(hs.HTTPStatus.OK)
+            s.send_header("Content-type", s.guess_type(path))
+            s.send_header("Content-Length", str(length))
+            s.send_header("Last-Modified", s.date_time_string(st.st_mtime))
+            s.send_header("ETag", etag)
+            s.end_headers()
+            return f
+        except:
+            f.close()
+            raise
+
+    def copyfile(s, source, outputfile):
+        """
+        copies the file to the output, using `sendfile` for files on disk
+        """
+        if isinstance(source, io.BytesIO):
+            outputfile.write(source.getvalue())
+        else:
+            sent = s.connection.sendfile(source, 0, s._sendLength)
+            if sent < s._sendLength: s.close_connection = True
+                # the file shrank: the body is shorter than the Content-Length sent
+
+
+class LivePreview():
+    """
+    renders meta markdown files on request (used by `LivePreviewHandler`)
+
+    :main:          the `PageBuilderMain` object (for the file names and settings)
+    :mdfiles:       the meta markdown files; if empty, all `*.md` files in the
+                    current directory (looked up on every request)
+    :no_style:      ignore style information
+
+    the builder is kept resident, and is recreated when one of the style,
+    template, settings or data files changes; the results are kept in an
+    in-memory `BuildManifest`, and files whose size and mtime did not change
+    are not even read again
+
+    USAGE
+
+        preview = LivePreview(PageBuilderMain(), ["a.md", "b.md"])
+        html = preview.page("a.html")           # None if there is no a.md
+        html = preview.page("document.html")    # the joint document
+    """
+
+    def __init__(s, main, mdfiles=None, no_style=False):
+        s.main          = main
+        s.mdfiles       = list(mdfiles or [])
+        s.no_style      = no_style
+        s.builder       = None
+        s.manifest      = None
+        s._config       = None      # stats of the config files
+        s._stats        = {}        # filename: (stat, key)
+        s._joint        = (None, None)      # (version, name of the joint document)
+        s._lock         = threading.Lock()
+
+    @staticmethod
+    def _stat(fn):
+        """
+        (mtime, size) of the file, or None if it does not exist
+        """
+        try:
+            st = os.stat(fn)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def files(s):
+        """
+        the meta markdown files
+
+        :returns:       list of tuple(filename, base_filename, html_filename)
+        """
+        mdfiles = s.mdfiles or sorted(fn for fn in os.listdir(".") if fn.endswith(".md"))
+        files = []
+        for fn in mdfiles:
+            fnbase, _ = os.path.splitext(fn)
+            _, fnbase = os.path.split(fnbase)
+            files.append( (fn, fnbase, fnbase+".html") )
+        return files
+
+    def version(s):
+        """
+        a value that changes whenever one of the input or config files changes
+        """
+        return tuple(s._stat(fn) for fn in s.main.configFiles() + [f[0] for f in s.files()])
+
+    def _configure(s):
+        """
+        (re)creates the builder if the style, template, settings or data files changed
+        """
+        configStats = tuple(s._stat(fn) for fn in s.main.configFiles())
+        if configStats == s._config: return
+        config = s.main.readStyleTemplateSettingsData()
+        if s.no_style: config = ("",) + config[1:]
+        s.builder = s.main.createBuilder(config)
+        if s.manifest is None: s.manifest = BuildManifest(None, config)
+        else: s.manifest.reconfigure(config)
+        s._config = configStats
+
+    def render(s, fn, fnbase):
+        """
+        converts one file (or returns the cached result)
+
+        :fn:            the file name
+        :fnbase:        the base file name
+        :returns:       tuple(html, innerHtml, metaData, metaDataRaw)
+        """
+        with s._lock:
+            s._configure()
+            stat = s._stat(fn)
+            result = None
+            if s._stats.get(fn, (None,))[0] == stat:
+                result = s.manifest.get(fn, s._stats[fn][1])
+            if result is None:
+                with open(fn, "r") as f: contents = f.read()
+                key = s.manifest.key(fn, contents)
+                result = s.manifest.get(fn, key)
+                if result is None:
+                    print("converting {0}".format(fn))
+                    result = s.builder(contents, _filename=fn, _filenamebase=fnbase)
+                    s.manifest.put(fn, key, result)
+                s._stats[fn] = (stat, key)
+            return result
+
+    def jointName(s):
+        """
+        the file name of the joint document
+
+        the name is only looked up again if one of the files changed; the files are
+        converted (or taken from the cache) up to the first one with a `jointfilename`
+        """
+        version = s.version()
+        if s._joint[0] != version:
+            name = "document.html"
+            for fn, fnbase, _ in s.files():
+                meta_data = s.render(fn, fnbase)[2]
+                if "jointfilename" in meta_data:
+                    name = meta_data["jointfilename"].strip()
+                    break
+            s._joint = (version, name)
+        return s._joint[1]
+
+    def document(s, name):
+        """
+        the joint document, assembled from the (cached) results of all files
+
+        :name:          the requested file name
+        :returns:       the html, or None if the joint document is not called `name`
+        """
+        html_list = []
+        full_meta = {}
+        for fn, fnbase, _ in s.files():
+            html, inner_html, meta_data, meta_data_raw = s.render(fn, fnbase)
+            html_list.append(inner_html)
+            meta_data['_filename'] = fn
+            meta_data['_filenamebase'] = fnbase
+            contract.applyUnder(meta_data, full_meta)
+        if full_meta.get("jointfilename", "document.html").strip() != name: return None
+        with s._lock:
+            return s.builder.createHtmlPageFromHtmlAndMeta("\n".join(html_list), full_meta)
+
+    def page(s, name):
+        """
+        the html for the page `name`
+
+        :name:          the requested file name, eg "a.html" or "document.html"
+        :returns:       the html, or None if `name` is not generated from a file
+
+        the joint document is only assembled if `name` is its name (see `jointName`)
+        """
+        files = s.files()
+        for fn, fnbase, fnhtml in files:
+            if fnhtml == name: return s.render(fn, fnbase)[0]
+        if name != s.jointName(): return None
+        return s.document(name)
+
+
+class LivePreviewHandler(CachingHTTPRequestHandler):
+    """
+    request handler for `--serve --live`: html pages that correspond to a meta
+    markdown file (and the joint document) are rendered on request by the
+    `LivePreview` object `preview`; everything else is served from disk
+
+    if `reload` is True, the pages contain a script that reloads them when
+    one of the inputs changes (using server sent events)
+
+    USAGE
+
+        handler = type("Handler", (LivePreviewHandler,), {"preview": LivePreview(main)})
+        main.runServer(8000, handler=handler)
+    """
+    preview         = None
+    reload          = False
+    EVENTS          = "/_pagebuilder/events"
+    INTERVAL        = 0.5
+    RELOADSCRIPT    = """<script>new EventSource("{}").onmessage = function() {{ location.reload(); }};</script>"""
 
-                # brk filter -> preserve (double) line breaks
-                elif filter == "brk":
-                    params1[k] = mm.parse_breaks(v)
+    def send_head(s):
+        """
+        renders the page if it is generated from a meta markdown file, otherwise
+        serves the file from disk (see `CachingHTTPRequestHandler.send_head`)
+        """
+        path = urllib.parse.unquote(urllib.parse.urlsplit(s.path).path)
+        if path == s.EVENTS and s.reload: return s._sendEvents()
+        if path.endswith(".html") and path.count("/") == 1:
+            try:
+                html = s.preview.page(path[1:])
+            except Exception as e:
+                traceback.print_exc()
+                s.send_error(hs.HTTPStatus.INTERNAL_SERVER_ERROR, "Conversion failed", repr(e))
+                return None
+            if html is not None: return s._sendHtml(html)
+        return super().send_head()
+
+    def _sendHtml(s, html):
+        """
+        sends the headers for the generated html
 
-                # now filter -> expects format string, returns current time
-                elif filter == "now":
-                    params1[k] = mm.parse_now(v)
-                    params1[field+"_html"] = params1[k]
+        :returns:       the file object with the body
+        """
+        if s.reload:
+            script = s.RELOADSCRIPT.format(s.EVENTS)
+            i = html.rfind("</body>")
+            html = html[:i] + script + html[i:] if i >= 0 else html + script
+        body = html.encode("utf-8")
+        etag = '"{}"'.format(hashlib.sha1(body).hexdigest())
+        if s._notModified(etag, None):
+            s.send_response(hs.HTTPStatus.NOT_MODIFIED)
+            s.send_header("ETag", etag)
+            s.end_headers()
+            return None
+        s.send_response(hs.HTTPStatus.OK)
+        s.send_header("Content-type", "text/html; charset=utf-8")
+        s.send_header("Content-Length", str(len(body)))
+        s.send_header("Cache-Control", "no-cache")
+        s.send_header("ETag", etag)
+        s.end_headers()
+        return io.BytesIO(body)
+
+    def _sendEvents(s):
+        """
+        sends a `reload` event whenever one of the inputs changes (does not
+        return until the client disconnects)
+        """
+        s.close_connection = True
+        s.send_response(hs.HTTPStatus.OK)
+        s.send_header("Content-type", "text/event-stream")
+        s.send_header("Cache-Control", "no-cache")
+        s.end_headers()
+        version = s.preview.version()
+        ticks = 0
+        try:
+            while True:
+                time.sleep(s.INTERVAL)
+                ticks += 1
+                newVersion = s.preview.version()
+                if newVersion != version:
+                    version = newVersion
+                    s.wfile.write(b"data: reload\n\n")
+                elif ticks % 30 == 0:
+                    s.wfile.write(b": keep-alive\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        return None
 
-                else:
-                    raise RuntimeError("Unkown filter '{}'".format(filter))
 
-            except BaseException as e:
-                #raise
-                message = _removeIndent("""
-                ============
-                FILTER ERROR
-                ============
-                file:       {}
-                field:      {}
-                value:      {}
-                error:      {}
-                """).format(params['_filename'], k, v, e)
-                print (message)
-                params1[field] = "<pre>"+message+"</pre>"
+########################################################################################
+## YAML AND JSON WRITERS
+
+from yaml.serializer import Serializer as _YAMLSerializer
+from yaml.representer import Representer as _YAMLRepresenter
+from yaml.resolver import Resolver as _YAMLResolver
+from yaml.events import StreamStartEvent, StreamEndEvent, DocumentStartEvent, \
+                        DocumentEndEvent, SequenceStartEvent, SequenceEndEvent
+try:
+    from yaml.cyaml import CEmitter as _YAMLEmitter     # libyaml
+except ImportError:
+    from yaml.emitter import Emitter as _YAMLEmitter
+
+class _YAMLStreamDumper(_YAMLEmitter, _YAMLSerializer, _YAMLRepresenter, _YAMLResolver):
+    """
+    the equivalent of `yaml.CDumper` (`yaml.Dumper` if libyaml is not available)
+    that can also write a list one item at a time (see `dumpList`)
+    """
 
-        params.update(params1)
-        return params
+    def __init__(s, stream, default_flow_style=False, sort_keys=True):
+        _YAMLEmitter.__init__(s, stream)
+        _YAMLSerializer.__init__(s)
+        _YAMLRepresenter.__init__(s, default_flow_style=default_flow_style, sort_keys=sort_keys)
+        _YAMLResolver.__init__(s)
 
-    def _sectionTemplate(s, **params):
+    def dumpList(s, items):
         """
-        processes section template, returning the html for the section
+        writes the list `items` as a YAML document, one item at a time
 
-        :params:    keyword arguments corresponding to the fields the
-                    template expect to be filled from the file data
-        :returns:   the section html
+        the output is the same as `yaml.dump(items)` provided that no object
+        is shared between items (anchors and aliases are only generated within
+        items, but numbered across the whole document)
         """
-        sectionTemplateName = params.get("sectiontemplate", "default")
-        sectionTemplateName = "_sectiontemplate_"+sectionTemplateName.strip()
-            # params['_sectiontemplate'] contains the (short) name of the template
-            # this is prepended with "_sectiontemplate_" to get the key under which it is stored
-            # eg the default template will be under "_sectiontemplate_default"
+        s.emit(StreamStartEvent())
+        s.emit(DocumentStartEvent(explicit=False))
+        s.emit(SequenceStartEvent(None, None, True, flow_style=s.default_flow_style))
+        for item in items:
+            node = s.represent_data(item)
+            s.anchor_node(node)
+            s.serialize_node(node, None, None)
+            s.serialized_nodes = {}
+            s.anchors = {}
+            s.represented_objects = {}
+            s.object_keeper = []
+            s.alias_key = None
+        s.emit(SequenceEndEvent())
+        s.emit(DocumentEndEvent(explicit=False))
+        s.emit(StreamEndEvent())
+
+def _sharesObjects(items):
+    """
+    True if any (non-scalar) object is referenced from more than one of the items
+    """
+    owner = {}
+    for i, item in enumerate(items):
+        stack = [item]
+        while stack:
+            obj = stack.pop()
+            if obj is None or isinstance(obj, (str, bytes, bool, int, float)): continue
+            if owner.setdefault(id(obj), i) != i: return True
+            if isinstance(obj, dict):
+                stack.extend(obj.keys())
+                stack.extend(obj.values())
+            elif isinstance(obj, (list, tuple, set, frozenset)):
+                stack.extend(obj)
+            elif hasattr(obj, "__dict__"):
+                stack.append(vars(obj))
+    return False
+
+def _writeYAML(f, data, records=False, sort_keys=True):
+    """
+    writes `data` as YAML into the file `f` (same as `f.write(yaml.dump(data))`,
+    but lists are written item by item, and libyaml is used if available)
+
+    :records:       if True, `data` is a list of independent records: objects
+                    shared between them are repeated in every record rather than
+                    written as aliases (ie the same as `yaml.dump([deepcopy(item)
+                    for item in data])`)
+    :sort_keys:     if False, the keys of dicts are written in their order
+    """
+    dumper = _YAMLStreamDumper(f, sort_keys=sort_keys)
+    if isinstance(data, list) and (records or not _sharesObjects(data)):
+        dumper.dumpList(data)
+    else:
+        dumper.open()
+        dumper.represent(data)
+        dumper.close()
+
+def _writeJSON(f, data):
+    """
+    writes `data` as JSON into the file `f` (same as `f.write(Serializer().writes(data,
+    output=Serializer.JSON))`, but lists are written item by item)
+    """
+    dumps = Serializer.backends[Serializer.JSON].dumps
+    if not isinstance(data, list):
+        f.write(dumps(data))
+        return
+    f.write("[")
+    for i, item in enumerate(data):
+        if i: f.write(", ")
+        f.write(dumps(item))
+    f.write("]")
+
+def _writeJSONLines(f, data):
+    """
+    writes the list `data` as JSON Lines into the file `f` (one item per line)
+    """
+    dumps = Serializer.backends[Serializer.JSON].dumps
+    for item in data:
+        f.write(dumps(item))
+        f.write("\n")
 
-        # process all meta data fields, applying filters
-        # for example :fieldname|md: applies the markdown filter to the contents
-        # of the field, and stores the result as :fieldname:
 
-        return s._processTemplate(sectionTemplateName, params)
+########################################################################################
+## CLASS BUILDER MAIN
 
-    def createHtmlPageFromHtmlAndMeta(s, bodyHtml, meta=None):
-        """
-        creates an entire HtmlPage based on the bodyHtml and meta data
-        """
-        if meta is None: meta = {}
-        #print(meta)
+import sys
+import argparse
+import tempfile
+import codecs
+import importlib
+import importlib.util
+from time import perf_counter
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 
-        title = meta.get("title", "")
-        metaTags = (
-                s.p['meta'].format(field=field, value=value)
-                for field, value in meta.get("_meta", {}).items()
-        )
 
-        return s._template(
-            body        = bodyHtml,
-            metatags    = "\n".join(metaTags), # that's html meta tags
-            style       = s._style,
-            **meta                          # that's meta data that might be rendered
-        )
+# the worker processes used by `readAndProcessInputFiles` each hold a builder
+# that is created once, when the worker starts
+_worker_builder = None
 
-    _MMD = namedtuple("mmdData", "pageHtml sectionHtml metaData metaDataRaw")
+def _initWorker(builderKwargs, builderUpdates, profile=False):
+    """
+    worker initializer: creates the worker's builder
 
-    def createHtmlPageFromMetaMarkdown(s, metaMarkdown, **additionalMeta):
-        """
-        creates an entire HtmlPage based on the meta markdown
+    :builderKwargs:     the kwargs the main builder was created with
+    :builderUpdates:    the parameters later changed with `updateParameters`
+    :profile:           if True, enable the `timings` in the worker
+    """
+    global _worker_builder
+    _worker_builder = PageBuilder(**builderKwargs)
+    if builderUpdates: _worker_builder.updateParameters(**builderUpdates)
+    timings.reset()
+        # a forked worker starts with a copy of the main process' timings
+    timings.enable(profile)
+
+def _convertInWorker(job):
+    """
+    converts one file in a worker process
 
-        :metaMarkdown:      the metaMarkdown data
-        :additionalMeta:    additional parameters to be added to the meta data
-        :returns:           Namedtuple(html, innerHtml, metaData, metaDataRaw)
-        """
+    :job:           tuple(filename, base_filename, file_contents)
+    :returns:       tuple(result, collected)
+    :result:        tuple(html, innerHtml, metaData, metaDataRaw)
+    :collected:     the worker's timings for this file (see `Timings.collect`)
+    """
+    fn, fnbase, contents = job
+    result = tuple(_worker_builder(contents, _filename=fn, _filenamebase=fnbase))
+    return result, timings.collect()
 
-        # process the meta markdown file with the settings body (links!)
-        processed = s._processMetaMarkdown(metaMarkdown+s._settings_body)
+def _parseInWorker(job, createHtml=True):
+    """
+    parses one file in a worker process (see `PageBuilder.parseMetaMarkdown`)
 
-        # extract the analysis
-        analysis = processed.analysis
-        #print("ANALYSIS PB2", analysis)
+    :job:           tuple(filename, base_filename, file_contents)
+    :createHtml:    if False, the body is not converted to html
+    :returns:       tuple(result, collected)
+    :result:        tuple(processed, metaData)
+    :collected:     the worker's timings for this file (see `Timings.collect`)
+    """
+    fn, fnbase, contents = job
+    with timings.file(fn):
+        result = _worker_builder.parseMetaMarkdown(contents, createHtml, _filename=fn, _filenamebase=fnbase)
+    return result, timings.collect()
 
-        # combine the meta data (processed > settings > additional)
-        metaData = contract([additionalMeta, s._settings_meta, processed.meta])
+def _mergeTimings(converted):
+    """
+    adds the timings returned by `_convertInWorker` to `timings`
 
-        # apply filters
-        metaData = s.applyFilters(metaData)
+    :converted:     iterable of the return values of `_convertInWorker`
+    :returns:       generator of the results
+    """
+    for result, collected in converted:
+        timings.merge(collected)
+        yield result
 
-        # apply the section template
-        sectionHtml = s._sectionTemplate(body=processed.html, **metaData)
 
-        # apply the main template
-        html = s.createHtmlPageFromHtmlAndMeta(bodyHtml=sectionHtml, meta=metaData)
+def _loadFunction(spec):
+    """
+    imports a function given as `module:function` or `path/to/file.py:function`
 
-        # return the results
-        metaData['_body'] = processed.body
-        metaData['_analysis'] = processed.analysis
-            # also store the body as a meta data field
-            # TODO: should this happen in the meta markdown class?
-        return s._MMD(html, sectionHtml, metaData, processed.meta)
+    :spec:          the function spec; a module is imported from the python path,
+                    a file is loaded as a module named after the file
+    :returns:       the function
+    """
+    module, _, name = spec.rpartition(":")
+    if not module or not name:
+        raise ValueError("Expected `module:function` or `file.py:function`, got '{}'".format(spec))
+    if module.endswith(".py"):
+        modspec = importlib.util.spec_from_file_location(
+                        os.path.splitext(os.path.basename(module))[0], module)
+        mod = importlib.util.module_from_spec(modspec)
+        modspec.loader.exec_module(mod)
+    else:
+        mod = importlib.import_module(module)
+    return getattr(mod, name)
+
+
+class SpillFile():
+    """
+    temporary file holding html fragments, so that they need not be kept in memory
 
-    def __call__(s, *args, **kwargs):
-        """
-        alias for `createHtmlPageFromMetaMarkdown`
+    USAGE
+
+        spill = SpillFile()
+        fragment = spill.add(html)      # a `SpilledFragment`
+        str(fragment)                   # == html
+        for chunk in fragment.chunks(): f.write(chunk)
+        spill.close()
+    """
+
+    def __init__(s):
+        s.file = tempfile.TemporaryFile()
+
+    def add(s, text):
         """
-        return s.createHtmlPageFromMetaMarkdown(*args, **kwargs)
+        appends `text` to the file
 
+        :returns:       the `SpilledFragment` for reading it back
+        """
+        data = text.encode("utf-8")
+        s.file.seek(0, os.SEEK_END)
+        offset = s.file.tell()
+        s.file.write(data)
+        return SpilledFragment(s, offset, len(data))
 
-pagebuilder = PageBuilder()
+    def close(s):
+        s.file.close()
 
 
+class SpilledFragment():
+    """
+    an html fragment stored in a `SpillFile`
+    """
+    __slots__ = ("spill", "offset", "size")
+    CHUNKSIZE = 1024*1024
 
-########################################################################################
-## CLASS BUILDER MAIN
+    def __init__(s, spill, offset, size):
+        s.spill     = spill
+        s.offset    = offset
+        s.size      = size
 
-import http.server as hs
-import sys
-import os
-import argparse
+    def chunks(s):
+        """
+        iterates over the text of the fragment in chunks of (at most) `CHUNKSIZE` bytes
+        """
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        remaining = s.size
+        position = s.offset
+        while remaining > 0:
+            f = s.spill.file
+            f.seek(position)
+            data = f.read(min(s.CHUNKSIZE, remaining))
+            if not data: break
+                # the file was truncated, the rest of the fragment is missing
+            position += len(data)
+            remaining -= len(data)
+            yield decoder.decode(data, final=remaining <= 0)
+
+    def __str__(s):
+        return "".join(s.chunks())
 
 
 class PageBuilderMain():
@@ -927,6 +2281,8 @@ class PageBuilderMain():
     FNSECTIONTEMPLATE   = "_SECTIONTEMPLATE"
     FNSECTIONTEMPLATES  = "_SECTIONTEMPLATES"
     FNEXAMPLE           = "EXAMPLE.md"
+    FNMANIFEST          = ".pagebuilder-manifest"
+    FNPROFILE           = "pagebuilder-profile.json"
 
     DESCRIPTION = """
 ---------------------------------------
@@ -1006,8 +2362,31 @@ Version v{}
                 help="do not include style information into the html output")
         ap.add_argument("--join", "-j", action="store_true", default=False,
                 help="create joined up file of all the input files")
+        ap.add_argument("--incremental", "-i", action="store_true", default=False,
+                help="only reconvert files that changed since the last run (uses {})".format(s.FNMANIFEST))
+        ap.add_argument("--jobs", type=int, default=1, metavar="N",
+                help="convert the files using N worker processes")
+        ap.add_argument("--jsonl", action="store_true", default=False,
+                help="also save the meta data as JSON Lines (document.jsonl)")
+        ap.add_argument("--spill", action="store_true", default=False,
+                help="keep the converted sections in a temporary file rather than in memory")
+        ap.add_argument("--aggregate", metavar="FILE.py:FUNC",
+                help="parse the files, pass their meta data to the function FUNC (or\n"
+                     "module:FUNC), add the dict it returns to the data, then render")
+        ap.add_argument("--meta-only", action="store_true", default=False,
+                help="only save the meta data (document.json etc), without converting to html")
+        ap.add_argument("--profile", action="store_true", default=False,
+                help="report the time per stage and of the slowest files (also saved to {})".format(s.FNPROFILE))
+        ap.add_argument("--profile-slowest", type=int, default=10, metavar="N",
+                help="with --profile: number of files listed (default 10)")
+        ap.add_argument("--watch", "-w", action="store_true", default=False,
+                help="stay resident, and rebuild whenever the inputs change")
         ap.add_argument("--serve", action="store_true", default=False,
                 help="run an http server (port 8314) on the current location")
+        ap.add_argument("--live", action="store_true", default=False,
+                help="with --serve: render the html pages from the markdown files on request")
+        ap.add_argument("--reload", action="store_true", default=False,
+                help="with --serve --live: reload the pages in the browser when the inputs change")
         ap.add_argument("--version", "-v", action="store_true", default=False,
                 help="print version number")
 
@@ -1052,14 +2431,14 @@ Version v{}
 
         try:
             with open(s.FNDATA+".json", "r") as f: data_json = f.read()
-            data_json = json.loads(data_json)
+            data_json = Serializer().reads(data_json, input=Serializer.JSON)
             print ("reading local", s.FNDATA+".json", tuple(data_json.keys()))
         except FileNotFoundError:
             data_json = {}
 
         try:
             with open(s.FNDATA+".yaml", "r") as f: data_yaml = f.read()
-            data_yaml = yaml.safe_load(data_yaml)
+            data_yaml = Serializer().reads(data_yaml, input=Serializer.YAML)
             print ("reading local", s.FNDATA+".yaml", tuple(data_yaml.keys()))
         except FileNotFoundError:
             data_yaml = {}
@@ -1068,21 +2447,48 @@ Version v{}
 
         return (style, template, sectiontemplate, sectiontemplates, settings, data_json)
 
+    def createBuilder(s, config):
+        """
+        creates the builder object
+
+        :config:        tuple(style, template, sectiontemplate, sectiontemplates, settings, data)
+                        as returned by `readStyleTemplateSettingsData`
+        :returns:       the `PageBuilder` object
+        """
+        style, template, sectiontemplate, sectiontemplates, settings, data = config
+        return PageBuilder(
+                    _style                      = style,
+                    _template                   = template,
+                    _sectiontemplate_default    = sectiontemplate,
+                    _sectiontemplates           = sectiontemplates,
+                    _settings                   = settings,
+                    _data                       = data,
+        )
+
+    def configFiles(s):
+        """
+        the names of the style, template, settings and data files
+
+        :returns:       list of file names (they do not need to exist)
+        """
+        return [s.FNSTYLE, s.FNTEMPLATE, s.FNSECTIONTEMPLATE, s.FNSECTIONTEMPLATES,
+                s.FNSETTINGS, s.FNDATA+".json", s.FNDATA+".yaml"]
+
     def runServer(s, port, bind=None, handler=None, server=None, protocol=None):
         """
         serve the local directory (called by `run`)
 
         :port:          at which port to serve
         :bind:          IP address to bind (typically 127.0.0.1 or 0.0.0.0)
-        :handler:       handler class (default: SimpleHTTPRequestHandler)
-        :server:        server class (default: HTTPServer)
-        :protocol:      protocol (default "HTTP/1.0")
+        :handler:       handler class (default: CachingHTTPRequestHandler)
+        :server:        server class (default: ThreadingHTTPServer)
+        :protocol:      protocol (default "HTTP/1.1", ie with keep-alive)
 
         Note: the code is taken out of http.server
         """
-        if handler  is None: handler    = hs.SimpleHTTPRequestHandler
-        if server   is None: server     = hs.HTTPServer
-        if protocol is None: protocol   = "HTTP/1.0"
+        if handler  is None: handler    = CachingHTTPRequestHandler
+        if server   is None: server     = hs.ThreadingHTTPServer
+        if protocol is None: protocol   = "HTTP/1.1"
         if bind     is None: bind       = "127.0.0.1"
 
         server_address = (bind, port)
@@ -1118,13 +2524,68 @@ Version v{}
         with open(s.FNEXAMPLE, "w") as f:           f.write(s.EXAMPLE)
 
 
-    def readAndProcessInputFiles(s, mdfiles, builder, save=True):
+    def readInputFile(s, fn):
+        """
+        reads one mmd input file
+
+        :fn:            the file name
+        :returns:       tuple(base_filename, file_contents)
+        """
+        fnbase, _ = os.path.splitext(fn)
+        _, fnbase = os.path.split(fnbase)
+        with timings.stage("main.read"):
+            with open(fn, "r") as f: contents = f.read()
+        return fnbase, contents
+
+    def parseInputFiles(s, mdfiles, builder, jobs=1, createHtml=True):
+        """
+        reads and parses all mmd input files, without applying the templates
+
+        :mdfiles:       list of filenames for the meta markdown files
+        :builder:       the builder object
+        :jobs:          number of worker processes used for parsing
+        :createHtml:    if False, the bodies are not converted to html (the result
+                        can then only be used for the meta data, see `parsedMeta`)
+        :returns:       list of tuple(filename, base_filename, parsed), where `parsed`
+                        is the result of `PageBuilder.parseMetaMarkdown`; this is
+                        the `parsed` argument of `readAndProcessInputFiles`
+        """
+        todo = [(fn,) + s.readInputFile(fn) for fn in mdfiles]
+        if jobs > 1 and len(todo) > 1:
+            with ProcessPoolExecutor(
+                        max_workers = jobs,
+                        initializer = _initWorker,
+                        initargs    = (builder._kwargs, builder._updates, timings.enabled)
+            ) as executor:
+                chunksize = max(1, len(todo) // (4*jobs))
+                parse = partial(_parseInWorker, createHtml=createHtml)
+                results = list(_mergeTimings(executor.map(parse, todo, chunksize=chunksize)))
+        else:
+            results = []
+            for fn, fnbase, contents in todo:
+                with timings.file(fn):
+                    results.append(builder.parseMetaMarkdown(contents, createHtml, _filename=fn, _filenamebase=fnbase))
+        return [(fn, fnbase, result) for (fn, fnbase, _), result in zip(todo, results)]
+
+    def readAndProcessInputFiles(s, mdfiles, builder, save=True, manifest=None, jobs=1, quiet=False, spill=None, parsed=None):
         """
         reads and processes all mmd input files, saves individual outputs
 
         :mdfiles:       list of filenames for the meta markdown files
         :builder:       the builder object
         :save:          if True (default), save generated files
+        :manifest:      if given, a `BuildManifest` object; unchanged files reuse
+                        the cached results, and their outputs are not rewritten
+                        (unless missing)
+        :jobs:          number of worker processes used for the conversion; the
+                        results are processed in input order, so the outputs do
+                        not depend on this number
+        :quiet:         if True, do not report unchanged files
+        :spill:         if given, a `SpillFile`; the inner html segments are then
+                        kept there rather than in memory (see `SpilledFragment`)
+        :parsed:        if given, the files as returned by `parseInputFiles`; they
+                        are not read again, only the templates are applied (in this
+                        process, and without manifest)
         :returns:       tuple(files, html, meta, metaRaw, fullMeta)
         :files:         list of filename tuples (filename, base_filename, html_filename)
         :html:          list of inner html segments per file
@@ -1139,48 +2600,95 @@ Version v{}
         meta_data_list = []
         meta_data_raw_list = []
 
-        for fn in mdfiles:
-            fnbase, _ = os.path.splitext(fn)
-            _, fnbase = os.path.split(fnbase)
-            fnhtml = fnbase+".html"
-            fnjson = fnbase+".json"
-            fnyaml = fnbase+".yaml"
-            files.append( (fn, fnbase, fnhtml) )
-            with open(fn, "r") as f: file_contents_mmd = f.read()
-            #html, inner_html, meta_data, meta_data_raw, analysis = \
-            html, inner_html, meta_data, meta_data_raw = \
-                builder(
-                    file_contents_mmd,
-                    _filename=fn,
-                    _filenamebase=fnbase
+        # files already parsed: only apply the templates
+        executor = None
+        if parsed is not None:
+            inputs = [(fn, fnbase, None, None, None) for fn, fnbase, _ in parsed]
+            def render(fn, processed, metaData):
+                with timings.file(fn):
+                    return tuple(builder.renderMetaMarkdown(processed, dict(metaData)))
+            converted = (render(fn, *result) for fn, _, result in parsed)
+            manifest = None
+
+        # otherwise read all files and look them up in the manifest
+        else:
+            inputs = []     # (fn, fnbase, contents, key, cached)
+            for fn in mdfiles:
+                fnbase, file_contents_mmd = s.readInputFile(fn)
+                key, cached = None, None
+                if manifest is not None:
+                    key = manifest.key(fn, file_contents_mmd)
+                    cached = manifest.get(fn, key)
+                inputs.append( (fn, fnbase, file_contents_mmd, key, cached) )
+
+            # convert the files that are not cached (in worker processes if jobs > 1)
+            todo = [(fn, fnbase, contents) for fn, fnbase, contents, _, cached in inputs if cached is None]
+            if jobs > 1 and len(todo) > 1:
+                executor = ProcessPoolExecutor(
+                                max_workers = jobs,
+                                initializer = _initWorker,
+                                initargs    = (builder._kwargs, builder._updates, timings.enabled)
+                )
+                chunksize = max(1, len(todo) // (4*jobs))
+                converted = _mergeTimings(executor.map(_convertInWorker, todo, chunksize=chunksize))
+            else:
+                converted = (
+                    tuple(builder(contents, _filename=fn, _filenamebase=fnbase))
+                    for fn, fnbase, contents in todo
                 )
-            #print ("ANALYSIS PB3", analysis)
-            #try:
-            #    print("====>ID QQQ", meta_data.get("id"))
-            #    print("====>SCORING QQQ", meta_data.get("scoring").get("Attractiveness"))
-            #except: pass
 
-            html_list.append(inner_html)
-            meta_data['_filename'] = fn
-            meta_data['_filenamebase'] = fnbase
-            meta_data_raw['_filename'] = fn
-            meta_data_raw['_filenamebase'] = fnbase
-            meta_data_list.append(deepcopy(meta_data))
-            #for d in meta_data_list:
-            #    try:
-            #        print("-----> QQQ", d.get("scoring").get("Attractiveness"))
-            #        print("----->ID QQQ", d.get("id"))
-            #    except: pass
-            meta_data_raw_list.append(deepcopy(meta_data_raw))
-            full_meta = contract([meta_data, full_meta])
-                # this applies the meta data from the right, so oldest entry wins!
-                # (in particular, settings always win!)
-            if "filename" in meta_data: fnhtml = meta_data['filename'].strip()
-            if save:
-                print("converting {0} to html (output: {1})".format(fn, fnhtml))
-                with open(fnhtml, "w") as f: f.write(html)
-                #with open(fnjson, "w") as f: f.write(json.dumps(analysis))
-                #with open(fnyaml, "w") as f: f.write("TODO")
+        try:
+            for fn, fnbase, file_contents_mmd, key, cached in inputs:
+                fnhtml = fnbase+".html"
+                fnjson = fnbase+".json"
+                fnyaml = fnbase+".yaml"
+                files.append( (fn, fnbase, fnhtml) )
+                if cached is None:
+                    #html, inner_html, meta_data, meta_data_raw, analysis = \
+                    result = builder._MMD(*next(converted))
+                    if manifest is not None: manifest.put(fn, key, result)
+                else:
+                    result = cached
+                html, inner_html, meta_data, meta_data_raw = result
+                #print ("ANALYSIS PB3", analysis)
+                #try:
+                #    print("====>ID QQQ", meta_data.get("id"))
+                #    print("====>SCORING QQQ", meta_data.get("scoring").get("Attractiveness"))
+                #except: pass
+
+                html_list.append(spill.add(inner_html) if spill is not None else inner_html)
+                meta_data['_filename'] = fn
+                meta_data['_filenamebase'] = fnbase
+                meta_data_raw['_filename'] = fn
+                meta_data_raw['_filenamebase'] = fnbase
+                with timings.stage("main.aggregate"):
+                    meta_data_list.append(copy(meta_data))
+                    #for d in meta_data_list:
+                    #    try:
+                    #        print("-----> QQQ", d.get("scoring").get("Attractiveness"))
+                    #        print("----->ID QQQ", d.get("id"))
+                    #    except: pass
+                    meta_data_raw_list.append(copy(meta_data_raw))
+                        # the records are shallow copies: their values are shared
+                        # with the results (and the manifest), and must not be modified
+                    contract.applyUnder(meta_data, full_meta)
+                        # this applies the meta data from below, so oldest entry wins!
+                        # (in particular, settings always win!)
+                if "filename" in meta_data: fnhtml = meta_data['filename'].strip()
+                if save and cached is not None and os.path.exists(fnhtml):
+                    if not quiet: print("unchanged {0} (output: {1})".format(fn, fnhtml))
+                elif save:
+                    print("converting {0} to html (output: {1})".format(fn, fnhtml))
+                    with timings.stage("main.write"):
+                        with open(fnhtml, "w") as f: f.write(html)
+                    #with open(fnjson, "w") as f: f.write(json.dumps(analysis))
+                    #with open(fnyaml, "w") as f: f.write("TODO")
+        except BaseException:
+            if executor is not None: executor.shutdown(cancel_futures=True)
+                # otherwise the workers are left running (eg in `watch`, which
+                # reports the error and carries on)
+            raise
+        if executor is not None: executor.shutdown()
 
 
         #for d in meta_data_list:
@@ -1190,22 +2698,41 @@ Version v{}
         #return (files, html_list, meta_data_list, meta_data_raw_list, full_meta, analysis)
         return (files, html_list, meta_data_list, meta_data_raw_list, full_meta)
 
-    def createJointDocument(s, builder, htmlList, meta, save=True):
+    def createJointDocument(s, builder, htmlList, meta, save=True, stream=False):
         """
         creates the joint document, concatenating the html and meta from all files
 
-        :html:          list of inner html per file
+        :html:          list of inner html per file (str or `SpilledFragment`)
         :builder:       the builder object
         :meta:          the aggregate meta data of all files
         :save:          if True (default), save generated file
+        :stream:        if True (and save), the file is written piece by piece
+                        (page head, sections, page tail) without ever creating
+                        the entire document in memory; the html is not returned
         :returns:       tuple(html)
-        :html:          the entire-document html
+        :html:          the entire-document html (None if streamed)
         """
-        full_html = "\n".join(htmlList)
-        html = builder.createHtmlPageFromHtmlAndMeta(full_html, meta)
         if "jointfilename" in meta: fnhtml = meta['jointfilename'].strip()
         else: fnhtml = "document.html"
 
+        parts = builder.createHtmlPageParts(meta) if save and stream else None
+        if parts is not None:
+            print("saving joined html file (output: {0})".format(fnhtml))
+            head, tail = parts
+            with open(fnhtml, "w") as f:
+                f.write(head)
+                for i, fragment in enumerate(htmlList):
+                    if i: f.write("\n")
+                    if isinstance(fragment, SpilledFragment):
+                        for chunk in fragment.chunks(): f.write(chunk)
+                    else:
+                        f.write(fragment)
+                f.write(tail)
+            return (None,)
+
+        full_html = "\n".join(str(fragment) for fragment in htmlList)
+        html = builder.createHtmlPageFromHtmlAndMeta(full_html, meta)
+
         if save:
             print("saving joined html file (output: {0})".format(fnhtml))
             with open(fnhtml, "w") as f: f.write(html)
@@ -1227,7 +2754,7 @@ Version v{}
             # TODO: this does not link to the joined file
         md = _INDEX.format(md)
         html = s.TEMPLATE.format(
-                    body=mdwn.markdown(md),
+                    body=mm.markdown_to_html(md),
                     title="INDEX",
                     style="", metatags=""
         )
@@ -1240,7 +2767,8 @@ Version v{}
     def saveMetaAndAnalysisData(s,
                     meta, metaRaw, analysis,
                     saveYAML=True, saveJSON=True,
-                    saveAggr=True, saveRaw=True, saveAnalysis=False):
+                    saveAggr=True, saveRaw=True, saveAnalysis=False,
+                    saveJSONL=False):
         """
         saves the list meta data in YAML and/or JSON format
 
@@ -1251,6 +2779,10 @@ Version v{}
         :saveJSON:      save as JSON
         :saveAggr:      save aggregated list
         :saveRaw:       save raw list
+        :saveJSONL:     also save the lists as JSON Lines (one file per line)
+
+        the lists are written to the files one record at a time, and objects
+        shared between records are written in full in each of them
         """
         FNBASE  = "document"
         FNBASEA = FNBASE + "_analysis"
@@ -1259,31 +2791,127 @@ Version v{}
         if saveYAML:
             if saveAggr:
                 print ("saving aggregate meta data (output: {0}.yaml)".format(FNBASE))
-                with open("{}.yaml".format(FNBASE), "w") as f:
-                    f.write(yaml.dump(meta, default_flow_style=False))
+                with open("{}.yaml".format(FNBASE), "w") as f: _writeYAML(f, meta, records=True)
             if saveRaw:
                 print ("saving raw meta data (output: {0}.r.yaml)".format(FNBASE))
-                with open("{}.r.yaml".format(FNBASE), "w") as f:
-                    f.write(yaml.dump(metaRaw, default_flow_style=False))
+                with open("{}.r.yaml".format(FNBASE), "w") as f: _writeYAML(f, metaRaw, records=True)
             if saveAnalysis:
                 print ("saving analysis data (output: {0}.yaml)".format(FNBASEA))
-                with open("{}.yaml".format(FNBASEA), "w") as f:
-                    f.write(yaml.dump(analysis, default_flow_style=False))
+                with open("{}.yaml".format(FNBASEA), "w") as f: _writeYAML(f, analysis)
 
 
         if saveJSON:
             if saveAggr:
                 print ("saving aggregate meta data (output: {0}.json)".format(FNBASE))
-                with open("{}.json".format(FNBASE), "w") as f:
-                    f.write(json.dumps(meta))
+                with open("{}.json".format(FNBASE), "w") as f: _writeJSON(f, meta)
             if saveRaw:
                 print ("saving raw meta data (output: {0}.r.json)".format(FNBASE))
-                with open("{}.r.json".format(FNBASE), "w") as f:
-                    f.write(json.dumps(metaRaw))
+                with open("{}.r.json".format(FNBASE), "w") as f: _writeJSON(f, metaRaw)
             if saveAnalysis:
                 print ("saving analysis data (output: {0}.json)".format(FNBASEA))
-                with open("{}.json".format(FNBASEA), "w") as f:
-                    f.write(json.dumps(analysis))
+                with open("{}.json".format(FNBASEA), "w") as f: _writeJSON(f, analysis)
+
+        if saveJSONL:
+            if saveAggr:
+                print ("saving aggregate meta data (output: {0}.jsonl)".format(FNBASE))
+                with open("{}.jsonl".format(FNBASE), "w") as f: _writeJSONLines(f, meta)
+            if saveRaw:
+                print ("saving raw meta data (output: {0}.r.jsonl)".format(FNBASE))
+                with open("{}.r.jsonl".format(FNBASE), "w") as f: _writeJSONLines(f, metaRaw)
+
+    def saveJointOutputs(s, builder, files, htmlList, meta, metaRaw, fullMeta, join=False, jsonl=False):
+        """
+        saves the outputs that depend on all files (called by `run` and `watch`)
+
+        :builder:       the builder object
+        :files:         the list of file tuples
+        :htmlList:      list of inner html per file
+        :meta:          individual meta data (after aggreation with settings)
+        :metaRaw:       individual meta data (before aggreation with settings)
+        :fullMeta:      the aggregate meta data dict
+        :join:          if true, also generate joint output for html
+        :jsonl:         if true, also save the meta data as JSON Lines
+        """
+        if join or 'join' in fullMeta or 'jointfilename' in fullMeta:
+            with timings.stage("main.joint"):
+                document_html, = s.createJointDocument(builder, htmlList, fullMeta, stream=True)
+
+        #for d in meta_data_list:
+        #    try: print("QQQ", d.get("scoring").get("Attractiveness"))
+        #    except: pass
+        analysis_dummy = {} # placeholder for aggregate analysis
+        with timings.stage("main.serialize"):
+            s.saveMetaAndAnalysisData(
+                meta, metaRaw, analysis_dummy,
+                saveYAML=True, saveJSON=True, saveAnalysis=False,
+                saveAggr=True, saveRaw=False, saveJSONL=jsonl)
+
+        with timings.stage("main.index"):
+            index_html, = s.createIndexHtml(files)
+
+    def watch(s, mdfiles, join=False, no_style=False, incremental=False, jobs=1, interval=0.5, jsonl=False):
+        """
+        builds all files, then stays resident and rebuilds when inputs change (called by `run`)
+
+        :mdfiles:       list of filenames for the meta markdown files
+        :join:          if true, also generate joint output for html
+        :no_style:      ignore style information
+        :incremental:   start from (and keep updating) the on-disk build manifest
+        :jobs:          number of worker processes used for the conversion
+        :interval:      the polling interval in seconds (see `Watcher`)
+        :jsonl:         if true, also save the meta data as JSON Lines
+
+        the per-file results are kept in an in-memory `BuildManifest`, so only
+        changed files are converted again; changes to the style, template,
+        settings or data files rebuild all files, changes to the section
+        templates only the files using a template that changed; the joint
+        document, the meta data and the index are saved after every rebuild
+        """
+        configFiles = s.configFiles()
+        watcher = Watcher(list(mdfiles)+configFiles, interval=interval)
+        config = builder = manifest = None
+        changed = set(configFiles)
+        try:
+            while True:
+                try:
+                    if config is None or changed.intersection(configFiles):
+                        # also retried until the first load succeeds: before
+                        # that there is no builder and no manifest
+                        newConfig = s.readStyleTemplateSettingsData()
+                        if no_style: newConfig = ("",) + newConfig[1:]
+                        newBuilder = s.createBuilder(newConfig)
+                        if manifest is None:
+                            manifest = BuildManifest(s.FNMANIFEST, newConfig)
+                            if incremental: manifest.load()
+                        elif newConfig[:2] + newConfig[4:] == config[:2] + config[4:]:
+                            # only section templates changed: keep the files
+                            # whose section template is the same as before
+                            def sectionTemplate(b, result):
+                                name = result[2].get("sectiontemplate", "default").strip()
+                                return b.p.get("_sectiontemplate_"+name)
+                            manifest.reconfigure(newConfig,
+                                    keep=lambda result: sectionTemplate(builder, result) == sectionTemplate(newBuilder, result))
+                        else:
+                            manifest.reconfigure(newConfig)
+                        config, builder = newConfig, newBuilder
+
+                    present = [fn for fn in mdfiles if os.path.exists(fn)]
+                    manifest.hits = manifest.misses = 0
+                    files, html_list, meta_data_list, meta_data_raw_list, full_meta = \
+                        s.readAndProcessInputFiles(present, builder, manifest=manifest, jobs=jobs, quiet=True)
+                    if incremental: manifest.save()
+                    print("Manifest: {} unchanged, {} converted".format(manifest.hits, manifest.misses))
+                    s.saveJointOutputs(builder, files, html_list, meta_data_list, meta_data_raw_list, full_meta, join, jsonl)
+
+                except Exception:
+                    traceback.print_exc()
+                print("Watching {} files for changes (Ctrl-C to exit) ...".format(len(watcher.filenames)))
+                changed = watcher.wait()
+                print("\nchanged:", ", ".join(sorted(changed)))
+        except KeyboardInterrupt:
+            print("\nKeyboard interrupt received, exiting.")
+        finally:
+            watcher.close()
 
     def run(s, **kwargs):
         """
@@ -1294,8 +2922,28 @@ Version v{}
         :mdfiles:           iterable of metamarkdown file names
         :join:              if true, also generate joint output for html
         :no_style:          ignore style information
+        :incremental:       reuse the results of unchanged files from the build manifest
+        :jobs:              number of worker processes used for the conversion
+        :jsonl:             also save the meta data as JSON Lines (document.jsonl)
+        :spill:             keep the converted sections in a temporary file rather
+                            than in memory (for very large joint documents)
+        :watch:             stay resident, and rebuild whenever the inputs change
+        :profile:           if given, the number of files listed in the timing report
+                            (see `reportTimings`)
+        :aggregate:         aggregation hook, a function(meta) -> dict, or its name
+                            (`module:function` or `file.py:function`); the files are
+                            parsed, the hook is run on their meta data, its result
+                            is added to the parameters, and the files are rendered
+                            (see `aggregateParsed`; not with `watch` or `incremental`)
+        :meta_only:         only parse the files and save the meta data (`document.json`
+                            etc), without html outputs (see `saveMetaOnly`; not with
+                            `watch`, and `aggregate` is ignored)
         :serve:             launch a server (see `port`)
         :port:              if server is given, that's the port, otherwise ignored
+        :live:              if server is given, render the html pages of `mdfiles`
+                            (all `*.md` files if empty) on request
+        :reload:            if live is given, reload the pages in the browser when
+                            the inputs change
         :save_templates:    save template files in current directory, then exit
 
         NOTE: the split between `main` and `run` is that (a) `run` does not
@@ -1305,7 +2953,12 @@ Version v{}
         """
         if kwargs.get("serve", False):
             port = kwargs.get("port", 8000)
-            s.runServer(port)
+            handler = None
+            if kwargs.get("live", False):
+                preview = LivePreview(s, kwargs.get("mdfiles", []), kwargs.get("no_style", False))
+                handler = type("Handler", (LivePreviewHandler,),
+                            {"preview": preview, "reload": kwargs.get("reload", False)})
+            s.runServer(port, handler=handler)
             return
 
         if kwargs.get("save_templates", False):
@@ -1315,39 +2968,138 @@ Version v{}
         mdfiles     = kwargs.get("mdfiles", [])
         no_style    = kwargs.get("no_style", False)
         join        = kwargs.get("join", False)
+        incremental = kwargs.get("incremental", False)
+        jobs        = kwargs.get("jobs", 1)
+        jsonl       = kwargs.get("jsonl", False)
+        aggregate   = kwargs.get("aggregate", None)
+        meta_only   = kwargs.get("meta_only", False)
+        if isinstance(aggregate, str): aggregate = _loadFunction(aggregate)
+        if aggregate is not None and incremental:
+            print("Aggregation hook given: ignoring the build manifest")
+            incremental = False
+        if meta_only: incremental = False
+
+        if kwargs.get("watch", False):
+            s.watch(mdfiles, join=join, no_style=no_style, incremental=incremental, jobs=jobs, jsonl=jsonl)
+            return
 
-        style, template, sectiontemplate, sectiontemplates, settings, data =  s.readStyleTemplateSettingsData()
-        if no_style: style = ""
-        builder = PageBuilder(
-                    _style                      = style,
-                    _template                   = template,
-                    _sectiontemplate_default    = sectiontemplate,
-                    _sectiontemplates           = sectiontemplates,
-                    _settings                   = settings,
-                    _data                       = data,
-        )
+        profile = kwargs.get("profile", None)
+        if profile is not None:
+            timings.reset()
+            timings.enable()
+        start = perf_counter()
+
+        with timings.stage("main.config"):
+            style, template, sectiontemplate, sectiontemplates, settings, data =  s.readStyleTemplateSettingsData()
+            if no_style: style = ""
+            manifest = None
+            if incremental:
+                manifest = BuildManifest(s.FNMANIFEST,
+                    (style, template, sectiontemplate, sectiontemplates, settings, data)).load()
+            builder = s.createBuilder((style, template, sectiontemplate, sectiontemplates, settings, data))
         print("Available section template names:", builder.p['_sectiontemplatenames'])
         print("Data:", tuple(data.keys()))
 
-        #files, html_list, meta_data_list, meta_data_raw_list, full_meta, analysis = \
-        files, html_list, meta_data_list, meta_data_raw_list, full_meta = \
-                                    s.readAndProcessInputFiles(mdfiles, builder)
+        if meta_only:
+            s.saveMetaOnly(mdfiles, builder, jobs=jobs, jsonl=jsonl)
 
-        #print ("ANALYSIS PB4", analysis)
+        else:
+            spill = SpillFile() if kwargs.get("spill", False) else None
+            try:
+                parsed = None
+                if aggregate is not None:
+                    parsed = s.parseInputFiles(mdfiles, builder, jobs=jobs)
+                    s.aggregateParsed(builder, parsed, aggregate)
 
-        if join or 'join' in full_meta or 'jointfilename' in full_meta:
-            document_html, = s.createJointDocument(builder, html_list, full_meta)
+                #files, html_list, meta_data_list, meta_data_raw_list, full_meta, analysis = \
+                files, html_list, meta_data_list, meta_data_raw_list, full_meta = \
+                        s.readAndProcessInputFiles(mdfiles, builder, manifest=manifest, jobs=jobs, spill=spill, parsed=parsed)
+                if manifest is not None:
+                    manifest.save()
+                    print("Manifest: {} unchanged, {} converted".format(manifest.hits, manifest.misses))
 
-        #for d in meta_data_list:
-        #    try: print("QQQ", d.get("scoring").get("Attractiveness"))
-        #    except: pass
-        analysis_dummy = {} # placeholder for aggregate analysis
-        s.saveMetaAndAnalysisData(
-            meta_data_list, meta_data_raw_list, analysis_dummy,
-            saveYAML=True, saveJSON=True, saveAnalysis=False,
-            saveAggr=True, saveRaw=False)
+                #print ("ANALYSIS PB4", analysis)
+
+                s.saveJointOutputs(builder, files, html_list, meta_data_list, meta_data_raw_list, full_meta, join, jsonl)
+            finally:
+                if spill is not None: spill.close()
+
+        if jobs <= 1:
+            print("Filter cache: {} hits, {} misses".format(builder.filterCache.hits, builder.filterCache.misses))
+                # with worker processes, each worker has its own cache
+
+        if profile is not None:
+            s.reportTimings(perf_counter()-start, profile)
+            timings.enable(False)
+
+    def parsedMeta(s, parsed):
+        """
+        the per-file meta data of the parsed files
+
+        :parsed:        the files as returned by `parseInputFiles`
+        :returns:       list of the meta data dicts, as saved in `document.json`
+                        (the dicts are new, but their values are shared with `parsed`)
+        """
+        return [
+            dict(metaData, _body=processed.body, _analysis=processed.analysis)
+            for _, _, (processed, metaData) in parsed
+        ]
+
+    def saveMetaOnly(s, mdfiles, builder, jobs=1, jsonl=False):
+        """
+        parses the files, and only saves their meta data (called by `run`)
+
+        :mdfiles:       list of filenames for the meta markdown files
+        :builder:       the builder object
+        :jobs:          number of worker processes used for parsing
+        :jsonl:         if true, also save the meta data as JSON Lines
+
+        the bodies are not converted to html, and no templates are applied, so
+        neither html files, nor the joint document, nor the index are created;
+        the meta data files are the same as in a full run
+        """
+        parsed = s.parseInputFiles(mdfiles, builder, jobs=jobs, createHtml=False)
+        print("parsed {} files (meta data only)".format(len(parsed)))
+        with timings.stage("main.serialize"):
+            s.saveMetaAndAnalysisData(
+                s.parsedMeta(parsed), None, {},
+                saveYAML=True, saveJSON=True, saveAnalysis=False,
+                saveAggr=True, saveRaw=False, saveJSONL=jsonl)
+
+    def aggregateParsed(s, builder, parsed, aggregate):
+        """
+        runs the aggregation hook on the parsed files, and adds the result to the builder
+
+        :builder:       the builder object
+        :parsed:        the files as returned by `parseInputFiles`
+        :aggregate:     function(meta) -> dict (or None); `meta` is the list of the
+                        per-file meta data, as saved in `document.json` (but not
+                        converted to JSON, and it must not be modified); the dict
+                        returned is added to the parameters like the contents of
+                        the `_DATA` files, eg `_select`
+
+        this replaces running the executable twice, with a script in between
+        that reads `document.json` and writes `_DATA.json`
+        """
+        with timings.stage("main.hook"):
+            data = aggregate(s.parsedMeta(parsed))
+        if data:
+            print("Aggregate:", tuple(data.keys()))
+            builder.updateParameters(**data)
 
-        index_html, = s.createIndexHtml(files)
+    def reportTimings(s, total, slowest=10):
+        """
+        prints the `timings` collected, and saves them as JSON (called by `run`)
+
+        :total:         the total run time (in seconds)
+        :slowest:       number of files listed (slowest first)
+        """
+        report = timings.report(slowest)
+        report["total"] = total
+        print("\nTimings (total {:.1f} ms; stage times include the stages they call)".format(total*1e3))
+        print(timings.summary(slowest))
+        print("saving timing report (output: {0})".format(s.FNPROFILE))
+        with open(s.FNPROFILE, "w") as f: json.dump(report, f, indent=4)
 
 
 
@@ -1372,7 +3124,8 @@ Version v{}
         if args.version: sys.exit(0)
 
         if args.serve:
-            s.run(serve=True, port=8000)
+            s.run(serve=True, port=8000, live=args.live, reload=args.reload,
+                    mdfiles=args.mdfiles, no_style=args.no_style)
             sys.exit(0)
 
         if args.save_templates:
@@ -1383,12 +3136,42 @@ Version v{}
             mdfiles     = args.mdfiles,
             join        = args.join,
             no_style    = args.no_style,
+            incremental = args.incremental,
+            jobs        = args.jobs,
+            jsonl       = args.jsonl,
+            spill       = args.spill,
+            watch       = args.watch,
+            profile     = args.profile_slowest if args.profile else None,
+            aggregate   = args.aggregate,
+            meta_only   = args.meta_only,
         )
 
 ########################################################################################
 ## CLASS SERIALIZER
 import yaml
 import json
+import datetime
+import transformer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+_Backend = namedtuple("_Backend", "name binary safe dumps loads detect errors")
+    # a serialization format, see `Serializer.register`
+    # :name:    the name of the format (eg for error messages)
+    # :binary:  True if `dumps` returns bytes, False if it returns str
+    # :safe:    True if `loads` can not execute code
+    # :dumps:   function obj -> str or bytes
+    # :loads:   function str or bytes -> obj
+    # :detect:  function str or bytes -> True if the data may be in this format
+    # :errors:  tuple of the exceptions raised by `loads` for invalid data
 
 class Serializer():
     """
@@ -1397,16 +3180,57 @@ class Serializer():
     the following parameters influence the serialization/deserialization process
 
     :safe:      if True, deserialization is _safe_, ie does not allow code
-                execution (that's the intention at least...)
-    :output:    which serializer to use (Serializer.JSON, Serializer,YAML)
+                execution (that's the intention at least...); in particular
+                PICKLE data is refused
+    :output:    which serializer to use (Serializer.JSON, Serializer,YAML,
+                Serializer.MSGPACK, Serializer.PICKLE)
+    :input:     which format `reads` expects (default: detected from the data)
+
+    the formats are provided by backends registered with `register`; JSON
+    is read with `orjson` if it is installed (it is always written with the
+    `json` module, so the output does not depend on it), and MSGPACK is only
+    available if `msgpack` is installed
+
+    USAGE
+
+        Serializer(output=Serializer.JSON).writes(obj)      # str
+        Serializer(output=Serializer.PICKLE).writes(obj)    # bytes
+        Serializer().reads(data)                            # format detected
+        Serializer().reads(data, input=Serializer.YAML)     # format given
+
+    ROUND TRIPS
+
+    for the types found in PageBuilder's meta data and results
+
+        obj = {
+            "o": OrderedDict([("a", 1)]),
+            "t": (1, 2),
+            "r": mm._Reference("lipsum", "https://lipsum.com/"),
+            "d": date(2018, 1, 1),
+        }
+        s = Serializer(safe=False)
+
+    YAML and PICKLE return the same types
+
+        s.reads(s.writes(obj, output=Serializer.YAML)) == obj
+        type(s.reads(s.writes(obj, output=Serializer.YAML))["r"])   # Reference
+
+    JSON and MSGPACK have no such types, so the values come back converted
+
+        s.reads(s.writes(obj, output=Serializer.JSON))
+        # {"o": {"a": 1}, "t": [1, 2], "r": ["lipsum", "https://lipsum.com/"], "d": "2018-01-01"}
     """
 
-    JSON = 0x01
-    YAML = 0x02
+    JSON    = 0x01
+    YAML    = 0x02
+    MSGPACK = 0x04
+    PICKLE  = 0x08
 
     safe =          True
     output =        YAML
+    input =         None
 
+    backends =      OrderedDict()   # format: _Backend (in detection order)
 
     class DeserializationError (RuntimeError): pass
     class ParameterError (RuntimeError): pass
@@ -1416,6 +3240,16 @@ class Serializer():
         s.params = {}
         s.params.update(params)
 
+    @classmethod
+    def register(cls, fmt, backend):
+        """
+        registers (or replaces) the backend for the format `fmt`
+
+        :fmt:       the format, eg Serializer.JSON
+        :backend:   the `_Backend`; the backends are tried in the order of registration
+                    when the format of the data is detected
+        """
+        cls.backends[fmt] = backend
 
     def p(s, name, params=None, default=None):
         """
@@ -1440,32 +3274,133 @@ class Serializer():
         write (aka serialize) an object to a string
 
         :obj:       the object to be serialised
-        :returns:   the string representation of the object
+        :returns:   the string representation of the object (bytes for binary formats)
         """
         output = s.p("output", params)
-        if output == s.JSON:
-            return json.dumps(obj)
-        elif output == s.YAML:
-            return yaml.dump(obj, default_flow_style=False)
-        else:
+        try:
+            backend = s.backends[output]
+        except KeyError:
             raise s.ParameterError("output", output)
-        return None
+        return backend.dumps(obj)
 
     def reads(s, objstr, **params):
         """
         read (aka deserialize) an object from a string
 
-        :objstr:    the string serialisation of the object
+        :objstr:    the string serialisation of the object (str or bytes)
         :returns:   the object
         """
-        try:
-            return json.loads(objstr)
-        except:
+        fmt = s.p("input", params)
+        if fmt is None:
+            candidates = [backend for backend in s.backends.values() if backend.detect(objstr)]
+        else:
             try:
-                return yaml.safe_load(objstr)
-            except:
-                raise s.DeserializationError(objstr, ["json", "yaml"])
+                candidates = [s.backends[fmt]]
+            except KeyError:
+                raise s.ParameterError("input", fmt)
+        if s.p("safe", params):
+            candidates = [backend for backend in candidates if backend.safe]
+
+        for backend in candidates:
+            try:
+                return backend.loads(objstr)
+            except backend.errors:
+                pass
+        raise s.DeserializationError(objstr, [backend.name for backend in candidates])
+
+
+def _isText(data):
+    """
+    True if `data` is a str, or bytes that are valid utf-8
+    """
+    if isinstance(data, str): return True
+    try:
+        data.decode("utf-8")
+        return True
+    except (UnicodeDecodeError, AttributeError):
+        return False
+
+def _jsonDefault(obj):
+    """
+    converts the objects that JSON does not support (`default` for the JSON encoders)
+    """
+    if isinstance(obj, (datetime.date, datetime.datetime)): return obj.isoformat()
+    if isinstance(obj, tuple): return list(obj)
+    raise TypeError("Type is not JSON serializable: {}".format(type(obj).__name__))
+
+def _dumpYAML(obj):
+    """
+    serializes to YAML (see `_writeYAML`)
+    """
+    f = io.StringIO()
+    _writeYAML(f, obj)
+    return f.getvalue()
+
 
+class _SerializerYAMLLoader(transformer.SafeLoader):
+    """
+    safe YAML loader that also constructs the python types that appear in
+    PageBuilder's outputs (tuples, OrderedDicts and References), and nothing else
+    """
+    def constructTuple(s, node):
+        return tuple(s.construct_sequence(node, deep=True))
+
+    def constructOrderedDict(s, node):
+        items, = s.construct_sequence(node, deep=True)
+        return OrderedDict(items)
+
+    def constructReference(s, node):
+        return mm._Reference(*s.construct_sequence(node, deep=True))
+
+_SerializerYAMLLoader.add_constructor("tag:yaml.org,2002:python/tuple",
+            _SerializerYAMLLoader.constructTuple)
+_SerializerYAMLLoader.add_constructor("tag:yaml.org,2002:python/object/apply:collections.OrderedDict",
+            _SerializerYAMLLoader.constructOrderedDict)
+_SerializerYAMLLoader.add_constructor("tag:yaml.org,2002:python/object/new:metamarkdown.Reference",
+            _SerializerYAMLLoader.constructReference)
+
+
+Serializer.register(Serializer.PICKLE, _Backend(
+    name    = "pickle",
+    binary  = True,
+    safe    = False,
+    dumps   = pickle.dumps,
+    loads   = pickle.loads,
+    detect  = lambda data: isinstance(data, bytes) and data[:1] == b"\x80" and data[1:2] in (b"\x02", b"\x03", b"\x04", b"\x05"),
+    errors  = (pickle.UnpicklingError, EOFError, AttributeError, ImportError, IndexError, TypeError, ValueError),
+))
+
+if msgpack is not None:
+    Serializer.register(Serializer.MSGPACK, _Backend(
+        name    = "msgpack",
+        binary  = True,
+        safe    = True,
+        dumps   = lambda obj: msgpack.packb(obj, default=_jsonDefault, use_bin_type=True),
+        loads   = lambda data: msgpack.unpackb(data, raw=False, strict_map_key=False),
+        detect  = lambda data: isinstance(data, bytes) and not _isText(data),
+        errors  = (ValueError, TypeError),
+    ))
+
+Serializer.register(Serializer.JSON, _Backend(
+    name    = "json",
+    binary  = False,
+    safe    = True,
+    dumps   = lambda obj: json.dumps(obj, default=_jsonDefault),
+        # always the stdlib encoder, so that document.json keeps its format
+    loads   = orjson.loads if orjson is not None else json.loads,
+    detect  = lambda data: _isText(data) and data.lstrip()[:1] in ("{", "[", '"', b"{", b"[", b'"'),
+    errors  = (ValueError,),
+))
+
+Serializer.register(Serializer.YAML, _Backend(
+    name    = "yaml",
+    binary  = False,
+    safe    = True,
+    dumps   = _dumpYAML,
+    loads   = lambda data: yaml.load(data, Loader=_SerializerYAMLLoader),
+    detect  = _isText,
+    errors  = (yaml.YAMLError,),
+))
 
 
 
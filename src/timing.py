@@ -0,0 +1,153 @@
+"""
+low-overhead per-stage timings for the metamarkdown and pagebuilder pipeline
+
+USAGE
+
+    from timing import timings
+
+    timings.enable()
+    with timings.stage("markdown"):
+        html = ...
+    with timings.file("test.md"):
+        ...
+    print(timings.summary(slowest=10))
+    report = timings.report(slowest=10)     # dict, eg to be saved as JSON
+
+NOTES
+- timings are disabled by default; `stage` and `file` then return a shared
+  no-op context manager, so the instrumentation costs a method call
+- stage times are inclusive: a stage that runs inside another one is counted
+  in both (eg `markdown` inside `parse`)
+- the timings of worker processes are collected there with `collect`, and
+  added in the main process with `merge`
+
+(c) Copyright Stefan LOESCH 2018. All rights reserved.
+Licensed under the MIT License
+<https://opensource.org/licenses/MIT>
+"""
+__version__ = "1.0"
+
+from time import perf_counter
+from contextlib import nullcontext
+
+
+_NOTIMER = nullcontext()
+
+class _Timer():
+    """
+    context manager adding the time spent inside to `totals[name]`
+    """
+    __slots__ = ("totals", "name", "start")
+
+    def __init__(s, totals, name):
+        s.totals = totals
+        s.name = name
+
+    def __enter__(s):
+        s.start = perf_counter()
+        return s
+
+    def __exit__(s, *exc):
+        t = s.totals.get(s.name)
+        if t is None: s.totals[s.name] = t = [0.0, 0]
+        t[0] += perf_counter() - s.start
+        t[1] += 1
+
+
+class Timings():
+    """
+    collects the time spent per stage, and per file
+
+    :enabled:       whether the timers are active (default: False)
+    :stages:        dict stage name: [total time (s), number of calls]
+    :files:         dict file name: [total time (s), number of calls]
+    """
+
+    def __init__(s):
+        s.enabled = False
+        s.reset()
+
+    def reset(s):
+        """
+        clears all timings collected so far
+        """
+        s.stages = {}
+        s.files = {}
+
+    def enable(s, enabled=True):
+        """
+        enables (or disables) the timers
+        """
+        s.enabled = enabled
+
+    def stage(s, name):
+        """
+        context manager timing the stage `name` (a no-op if disabled)
+        """
+        if not s.enabled: return _NOTIMER
+        return _Timer(s.stages, name)
+
+    def file(s, name):
+        """
+        context manager timing the processing of the file `name` (a no-op if disabled)
+        """
+        if not s.enabled: return _NOTIMER
+        return _Timer(s.files, name)
+
+    def collect(s):
+        """
+        returns the timings collected so far (for `merge`), and resets them
+
+        :returns:       tuple(stages, files), or None if disabled
+        """
+        if not s.enabled: return None
+        result = (s.stages, s.files)
+        s.reset()
+        return result
+
+    def merge(s, collected):
+        """
+        adds timings returned by `collect` (eg in a worker process)
+        """
+        if collected is None: return
+        for totals, other in zip((s.stages, s.files), collected):
+            for name, (time, calls) in other.items():
+                t = totals.get(name)
+                if t is None: totals[name] = t = [0.0, 0]
+                t[0] += time
+                t[1] += calls
+
+    def report(s, slowest=10):
+        """
+        the timings as a dict (that can be saved as JSON)
+
+        :slowest:       number of files listed (slowest first)
+        :returns:       dict(stages=..., files=..., slowest=...)
+        """
+        files = sorted(s.files.items(), key=lambda item: item[1][0], reverse=True)
+        return {
+            "stages":   {name: {"time": t, "calls": n} for name, (t, n) in sorted(s.stages.items())},
+            "files":    len(s.files),
+            "slowest":  [{"file": name, "time": t} for name, (t, _) in files[:slowest]],
+        }
+
+    def summary(s, slowest=10):
+        """
+        the timings as a human readable table
+
+        :slowest:       number of files listed (slowest first)
+        """
+        report = s.report(slowest)
+        lines = ["{:<24} {:>10} {:>8} {:>12}".format("stage", "total ms", "calls", "us/call")]
+        for name, t in report["stages"].items():
+            lines.append("{:<24} {:>10.1f} {:>8d} {:>12.1f}".format(
+                    name, t["time"]*1e3, t["calls"], t["time"]/t["calls"]*1e6))
+        if report["slowest"]:
+            lines.append("")
+            lines.append("slowest {} of {} files".format(len(report["slowest"]), report["files"]))
+            for f in report["slowest"]:
+                lines.append("{:>10.1f} ms  {}".format(f["time"]*1e3, f["file"]))
+        return "\n".join(lines)
+
+
+timings = Timings()
@@ -9,10 +9,36 @@ exist in both.
 Licensed under the MIT License
 <https://opensource.org/licenses/MIT>
 """
-__version__ = "1.1"
+__version__ = "1.2"
 
 import json
 import yaml
+from copy import copy
+from collections.abc import Mapping
+
+try:
+    from yaml import CSafeLoader as SafeLoader      # libyaml
+except ImportError:
+    from yaml import SafeLoader
+
+
+def yaml_load(stream):
+    """
+    safely loads a single YAML document (using libyaml if available)
+
+    :stream:        the YAML string (or file object)
+    :returns:       the loaded object
+    """
+    return yaml.load(stream, Loader=SafeLoader)
+
+def yaml_load_all(stream):
+    """
+    safely loads all documents from a YAML stream (using libyaml if available)
+
+    :stream:        the YAML string (or file object)
+    :returns:       generator of the loaded objects
+    """
+    return yaml.load_all(stream, Loader=SafeLoader)
 
 
 class Transformer():
@@ -35,30 +61,16 @@ class Transformer():
 
     DELETE_NONE_VALUES = True
 
-    def _merge_key_into_dict(s, key, value, target):
+    @classmethod
+    def _copy(cls, value):
         """
-        merges {key: value} into the target dict (which is modified)
-
-        - if the key does not exist yet, the pair key: value is simply added
-        - if the keys does exist, then
-            - if
+        copies nested dicts (preserving their type), returns other values as they are
         """
-        try:
-            target_value = target[key]
-
-        except KeyError:
-            if not value is None or not s.DELETE_NONE_VALUES:
-                target[key] = value
-            return
-
-        if isinstance(target_value, dict) and isinstance(value, dict):
-            target[key] = s.apply(value, target_value)
-
-        else:
-            if value is None and s.DELETE_NONE_VALUES:
-                del target[key]
-            else:
-                target[key] = value
+        if not isinstance(value, dict): return value
+        value = copy(value)
+        for k, v in value.items():
+            if isinstance(v, dict): value[k] = cls._copy(v)
+        return value
 
     def apply(s, transformation_s, target=None):
         """
@@ -68,6 +80,12 @@ class Transformer():
         :target:            the target dict where the transformation is applied
                             (the target dict is modified in place!)
         :returns:           the target dict
+
+        for every key: dicts are merged into dicts already in the target, None
+        values delete the key from the target (if `DELETE_NONE_VALUES`), and
+        all other values are added or replace the target value; dicts are copied
+        when they are added, so that merging into them later on does not modify
+        the transformation dicts
         """
         if target is None: target = {}
 
@@ -76,9 +94,50 @@ class Transformer():
                 target = s.apply(transformation, target)
                 return target
 
+        # all values are added with a single update (which keeps the key order),
+        # and then the dicts and None values are merged one by one
         transformation = transformation_s
+        merged = [k for k, v in transformation.items() if v is None or isinstance(v, dict)]
+        previous = {key: target.get(key) for key in merged}
+        target.update(transformation)
+        for key in merged:
+            value = transformation[key]
+            if value is None:
+                if s.DELETE_NONE_VALUES: del target[key]
+            elif isinstance(previous[key], dict):
+                target[key] = s.apply(value, previous[key])
+            else:
+                target[key] = s._copy(value)
+        return target
+
+    def applyUnder(s, transformation, target):
+        """
+        apply a single transformation dict *under* the target dict, ie the target wins
+
+        :transformation:    the transformation dict to apply
+        :target:            the target dict (modified in place!), as returned by
+                            `contract` or `applyUnder` (ie without None values)
+        :returns:           the target dict
+
+        this is the same as `target = contract([transformation, target])` (so
+        folding a sequence of dicts with it, the oldest entry wins), except that
+        new keys are added at the end of the target, and that the cost does not
+        depend on the size of the target, only on that of the transformation
+        """
         for key, value in transformation.items():
-            s._merge_key_into_dict(key, value, target)
+            try:
+                target_value = target[key]
+            except KeyError:
+                if not value is None or not s.DELETE_NONE_VALUES:
+                    target[key] = s._copy(value)
+                continue
+
+            if target_value is None and s.DELETE_NONE_VALUES:
+                del target[key]
+            elif value is None:
+                pass
+            elif isinstance(target_value, dict) and isinstance(value, dict):
+                target[key] = s.apply(target_value, s._copy(value))
         return target
 
     @classmethod
@@ -104,7 +163,7 @@ class Transformer():
         expects a yaml or json file and converts it to generator of dicts
         """
         try:
-            result = yaml.safe_load_all(yaml_or_json)
+            result = yaml_load_all(yaml_or_json)
         except:
             try:
                 result = json.loads(yaml_or_json)
@@ -153,3 +212,120 @@ class Transformer():
         return s.contract(*args, **kwargs)
 
 contract = Transformer()
+
+
+class LayeredDict(Mapping):
+    """
+    read-only view of a list of dicts, merged with the semantics of `Transformer`
+
+    :layers:        the dicts, in `contract` order (ie later layers win); they
+                    are not copied, and must not be modified while the view
+                    is in use
+    :transformer:   the `Transformer` defining the merge (default: `contract`)
+
+    the view is meant as the (large, shared) bottom of many small merges, eg
+    the settings under the meta data of every file: `over` returns the same
+    dict as `contract` with further layers on top (and below), but the layers
+    of the view are only merged once
+
+    USAGE
+
+        from transformer import LayeredDict
+
+        settings = LayeredDict([{'a': 1, 'b': 1, 'meta': {'x': 1}}])
+        settings['meta']                                # {'x': 1}
+        settings.over({'b': 2, 'meta': {'y': 2}}, below={'c': 3})
+            # {'c': 3, 'a': 1, 'b': 2, 'meta': {'x': 1, 'y': 2}}
+
+    NOTES
+    - key lookups only look at the layers containing the key; merged dicts are
+      copied (once) when they are looked up, so the layers are never modified
+    - iterating, and `over`, use the merged layers (`contract(layers)`, created
+      on first use); the values of the view must not be modified, `over` copies
+      the dicts like `contract` does
+    """
+
+    _MISSING = object()
+
+    def __init__(s, layers, transformer=None):
+        s._layers = [layer for layer in layers if layer]
+        s._transformer = transformer if transformer is not None else contract
+        s._values = {}          # key: value looked up
+        s._merged = None        # contract(layers)
+        s._dictKeys = None      # the keys of `_merged` with dict values
+        s._keys = None          # the keys of all layers
+
+    def _merge(s):
+        """
+        returns `contract(layers)` (merged on first use)
+        """
+        if s._merged is None:
+            s._merged = s._transformer.contract(s._layers)
+            s._dictKeys = [k for k, v in s._merged.items() if isinstance(v, dict)]
+        return s._merged
+
+    def overlaps(s, other):
+        """
+        True if any key of `other` is a key of one of the layers (also if it is deleted there)
+        """
+        if s._keys is None:
+            s._keys = set().union(*s._layers)
+        return not s._keys.isdisjoint(other)
+
+    def over(s, *layers, below=None):
+        """
+        merges further dicts on top of (and below) the view
+
+        :layers:        the dicts merged on top, in `contract` order
+        :below:         if given, a dict merged below
+        :returns:       a new dict, equal to `contract([below, *view_layers, *layers])`
+
+        the merged layers of the view are copied with a single update, and their
+        dicts copied, unless the keys of `below` are also in the layers of the view
+        (they would then be merged one by one)
+        """
+        if below and s.overlaps(below):
+            return s._transformer.contract([below] + s._layers + list(layers))
+        target = s._transformer.apply(below, {}) if below else {}
+        target.update(s._merge())
+        for key in s._dictKeys:
+            target[key] = s._transformer._copy(target[key])
+        for layer in layers:
+            s._transformer.apply(layer, target)
+        return target
+
+    def __getitem__(s, key):
+        if s._merged is not None: return s._merged[key]
+        try: return s._values[key]
+        except KeyError: pass
+
+        # the layers from the top; dicts are merged until the first other value
+        dicts = []
+        for layer in reversed(s._layers):
+            value = layer.get(key, s._MISSING)
+            if value is s._MISSING: continue
+            if value is None and s._transformer.DELETE_NONE_VALUES: break
+            if not isinstance(value, dict):
+                if dicts: break
+                return value
+            dicts.append(value)
+        if not dicts: raise KeyError(key)
+        value = s._transformer._copy(dicts.pop())
+        for transformation in reversed(dicts):
+            s._transformer.apply(transformation, value)
+        s._values[key] = value
+        return value
+
+    def __contains__(s, key):
+        try: s[key]
+        except KeyError: return False
+        return True
+
+    def __iter__(s):
+        return iter(s._merge())
+
+    def __len__(s):
+        return len(s._merge())
+
+    def __repr__(s):
+        return "{}({!r})".format(type(s).__name__, s._layers)
@@ -0,0 +1,41 @@
+"""
+converting the files in worker processes (`--jobs`)
+
+USAGE
+
+    python3 -m pytest tests
+"""
+import os
+import sys
+import multiprocessing
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import pytest
+import pagebuilder as pb
+
+
+def writeFiles(path, count, broken=None):
+    names = []
+    for i in range(count):
+        name = "{:03d}.md".format(i)
+        text = ":title: File {}\n\n# Heading {}\n\ntext\n".format(i, i)
+        if i == broken: text = ":filename: missing/directory.html\n" + text
+        (path / name).write_text(text)
+        names.append(name)
+    return names
+
+def test_same_as_serial(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    main, builder = pb.PageBuilderMain(), pb.PageBuilder()
+    names = writeFiles(tmp_path, 6)
+    serial = main.readAndProcessInputFiles(names, builder, save=False)
+    parallel = main.readAndProcessInputFiles(names, builder, save=False, jobs=3)
+    assert parallel == serial
+
+def test_workers_shut_down_on_error(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    main, builder = pb.PageBuilderMain(), pb.PageBuilder()
+    names = writeFiles(tmp_path, 6, broken=1)
+    with pytest.raises(FileNotFoundError):
+        main.readAndProcessInputFiles(names, builder, jobs=3)
+    assert multiprocessing.active_children() == []
@@ -0,0 +1,61 @@
+"""
+the build manifest keeps the results exactly, and loading it does not execute code
+
+USAGE
+
+    python3 -m pytest tests
+"""
+import os
+import sys
+import json
+import pickle
+from datetime import date
+from collections import OrderedDict
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import metamarkdown as mm
+from pagebuilder import BuildManifest
+
+
+META = {
+    "_filename": "a.md",
+    "title": "A",
+    "_analysis": {"references": (mm._Reference("a", "https://a.com/"),)},
+    "meta": OrderedDict([("z", "1"), ("a", "2")]),
+    "date": date(2018, 1, 1),
+    "text": "line 1\r\nline 2  \n\ttab: 'quote' \"double\" ü",
+}
+RESULT = ("<html>\n</html>", "<p>a</p>\n", META, dict(META))
+
+def test_roundtrip(tmp_path):
+    fn = str(tmp_path / "manifest")
+    manifest = BuildManifest(fn, ["config"])
+    key = manifest.key("a.md", "contents")
+    manifest.put("a.md", key, RESULT)
+    manifest.save()
+
+    loaded = BuildManifest(fn, ["config"]).load()
+    result = loaded.get("a.md", key)
+    assert result == RESULT
+    assert list(result[2]) == list(META)
+    assert type(result[2]["meta"]) is OrderedDict
+    assert type(result[2]["_analysis"]["references"][0]) is mm._Reference
+    assert loaded.get("a.md", "other key") is None
+    assert BuildManifest(fn, ["other config"]).load().entries == {}
+
+def test_refuses_code(tmp_path):
+    fn = str(tmp_path / "manifest")
+    flag = tmp_path / "executed"
+
+    class Exploit():
+        def __reduce__(s): return (open, (str(flag), "w"))
+
+    with open(fn, "wb") as f: f.write(pickle.dumps({"config": "x", "entries": Exploit()}))
+    assert BuildManifest(fn).load().entries == {}
+
+    manifest = BuildManifest(fn)
+    with open(fn, "w") as f:
+        json.dump({"config": manifest.configHash, "entries": {"a.md": ["key",
+            "!!python/object/apply:builtins.open ['{}', 'w']".format(flag)]}}, f)
+    assert manifest.load().get("a.md", "key") is None
+    assert not flag.exists()
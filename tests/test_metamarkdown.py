@@ -0,0 +1,82 @@
+"""
+the linear-time filters and analysers of `metamarkdown` give the same results
+as the regexes they replace
+
+USAGE
+
+    python3 -m pytest tests
+"""
+import os
+import re
+import sys
+import random
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import pytest
+import metamarkdown as mm
+
+
+LEGACY = {
+    "emdash":       lambda s: re.sub(r"[\s]*--[\s]*", "—", s),
+    "linecomments": lambda s: re.sub(r"^[\s]*//.*$", "", s, flags=re.MULTILINE),
+    "comments":     lambda s: re.sub(r"\s//.*$", "", s, flags=re.MULTILINE),
+    "definitions":  lambda s: "\n".join(re.findall(r"^\s*\[.*\]:.*$", s, re.MULTILINE)),
+    "references":   lambda s: re.findall(r"\[([\w]*)\]:([\w:\/\.-]*)\s", s),
+}
+
+CURRENT = {
+    "emdash":       lambda s: mm._replace_emdash(s, True),
+    "linecomments": lambda s: mm._removeLineComments(s, True),
+    "comments":     lambda s: mm._removeComments(s, True),
+    "definitions":  lambda s: mm._definitionsOnly(s, True),
+    "references":   lambda s: [tuple(r) for r in mm._extract_references(s)["references"]],
+}
+
+UNICODE_WS = "\u00a0\u2003\u3000\u2028\u0085\x0b\x0c\x1c"
+
+EDGE_INPUTS = {
+    "empty":            "",
+    "newline":          "\n",
+    "empty lines":      "\n\n\n// comment\n\n\n[a]:https://a.com/\n\n\n",
+    "leading empty":    "\n\n  \n\t\n// comment\ntext -- more\n",
+    "comment at end":   "text\n\n   // comment",
+    "comment first":    "// comment\ntext",
+    "comments only":    "//\n//\n  //x\n",
+    "inline comment":   "text // comment\n  text2 //comment2\n",
+    "trailing commas":  "key1 := value1,\nkey2 := value2,\n",
+    "sep":              ":meta:   author := x -- y,\n         license := MIT\n// a := b\n",
+    "sep no space":     "a:=b,c:=d,\n[ref]:=x\n",
+    "crlf":             "line -- one\r\n\r\n// comment\r\n  [a]:https://a.com/\r\ntext\r\n",
+    "crlf only":        "\r\n\r\n\r\n--\r\n\r\n",
+    "unicode ws":       "a" + UNICODE_WS + "--" + UNICODE_WS + "b\n" + UNICODE_WS + "// c\n" + UNICODE_WS + "[d]:e\n",
+    "unicode lines":    "\u2028\u2028// c\n\u0085\n[d]:https://d.com/ \n",
+    "dashes":           "---- - -- ---\n--\n\n--",
+    "definitions":      "[a]:https://a.com/\n  [b]: https://b.com/\ntext [c]\n\t[]:x\n[d]:",
+    "references":       "[a]:https://a.com/ [b]:b.com\n[c]:c-d.e/f\t[e]:\n",
+}
+
+@pytest.mark.parametrize("fname", sorted(LEGACY))
+@pytest.mark.parametrize("iname", sorted(EDGE_INPUTS))
+def test_edge_inputs(fname, iname):
+    s = EDGE_INPUTS[iname]
+    assert CURRENT[fname](s) == LEGACY[fname](s)
+
+@pytest.mark.parametrize("fname", sorted(LEGACY))
+def test_random_inputs(fname):
+    # documents made of the characters that matter for the patterns
+    alphabet = [" ", " ", "\t", "\n", "\n", "\r\n", "\u00a0", "-", "-", "/", "/",
+                "[", "]", ":", ":=", ",", "a", "b", "x.y"]
+    rnd = random.Random(16)
+    for _ in range(2000):
+        s = "".join(rnd.choice(alphabet) for _ in range(rnd.randrange(40)))
+        assert CURRENT[fname](s) == LEGACY[fname](s), repr(s)
+
+@pytest.mark.parametrize("fname", ["emdash", "linecomments", "definitions"])
+def test_not_executed(fname):
+    func = {
+        "emdash":       mm._replace_emdash,
+        "linecomments": mm._removeLineComments,
+        "definitions":  mm._definitionsOnly,
+    }[fname]
+    s = EDGE_INPUTS["sep"]
+    assert func(s, False) == s
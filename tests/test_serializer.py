@@ -0,0 +1,81 @@
+"""
+round trips of PageBuilder's meta data types through the `Serializer` backends
+
+USAGE
+
+    python3 -m pytest tests
+"""
+import os
+import sys
+import json
+from datetime import date
+from collections import OrderedDict
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import pytest
+import metamarkdown as mm
+from pagebuilder import Serializer
+
+
+OBJ = {
+    "o": OrderedDict([("b", 1), ("a", {"x": [1, 2]})]),
+    "t": (1, "two"),
+    "r": mm._Reference("lipsum", "https://lipsum.com/"),
+    "d": date(2018, 1, 1),
+    "refs": {"references": (mm._Reference("a", "https://a.com/"), mm._Reference("b", "https://b.com/"))},
+}
+
+def roundtrip(obj, fmt, **params):
+    s = Serializer(safe=False)
+    return s.reads(s.writes(obj, output=fmt, **params), input=fmt)
+
+
+@pytest.mark.parametrize("fmt", [Serializer.YAML, Serializer.PICKLE])
+def test_roundtrip_types(fmt):
+    result = roundtrip(OBJ, fmt)
+    assert result == OBJ
+    assert type(result["o"]) is OrderedDict
+    assert list(result["o"]) == ["b", "a"]
+    assert type(result["t"]) is tuple
+    assert type(result["r"]) is mm._Reference
+    assert result["r"].url == "https://lipsum.com/"
+    assert type(result["d"]) is date
+    assert all(type(ref) is mm._Reference for ref in result["refs"]["references"])
+
+def test_roundtrip_json():
+    result = roundtrip(OBJ, Serializer.JSON)
+    assert result == {
+        "o": {"b": 1, "a": {"x": [1, 2]}},
+        "t": [1, "two"],
+        "r": ["lipsum", "https://lipsum.com/"],
+        "d": "2018-01-01",
+        "refs": {"references": [["a", "https://a.com/"], ["b", "https://b.com/"]]},
+    }
+    assert list(result["o"]) == ["b", "a"]
+
+@pytest.mark.parametrize("fmt", [Serializer.YAML, Serializer.PICKLE, Serializer.JSON])
+def test_detect(fmt):
+    s = Serializer(safe=False)
+    data = s.writes(OBJ, output=fmt)
+    assert s.reads(data) == s.reads(data, input=fmt)
+
+def test_json_format():
+    # the same text as the `json` module, whichever backend reads it
+    obj = {"a": [1, (2, 3)], "ü": "é", "d": date(2018, 1, 1)}
+    assert Serializer().writes(obj, output=Serializer.JSON) == \
+        json.dumps({"a": [1, [2, 3]], "ü": "é", "d": "2018-01-01"})
+
+def test_safe_refuses_pickle():
+    data = Serializer().writes(OBJ, output=Serializer.PICKLE)
+    with pytest.raises(Serializer.DeserializationError):
+        Serializer().reads(data)
+    with pytest.raises(Serializer.DeserializationError):
+        Serializer().reads(data, input=Serializer.PICKLE)
+
+def test_yaml_refuses_other_python_tags():
+    with pytest.raises(Serializer.DeserializationError):
+        Serializer().reads("!!python/object/apply:os.system ['true']", input=Serializer.YAML)
+
+@pytest.mark.skipif(Serializer.MSGPACK not in Serializer.backends, reason="msgpack not installed")
+def test_roundtrip_msgpack():
+    assert roundtrip(OBJ, Serializer.MSGPACK) == roundtrip(OBJ, Serializer.JSON)
@@ -0,0 +1,64 @@
+"""
+the caching request handler sends bodies that match their Content-Length
+
+USAGE
+
+    python3 -m pytest tests
+"""
+import os
+import sys
+import types
+import threading
+import http.client
+import http.server as hs
+from collections import OrderedDict
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import pytest
+import pagebuilder as pb
+
+
+class QuietHandler(pb.CachingHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    _cache = OrderedDict()
+    def log_message(s, *args): pass
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    httpd = hs.ThreadingHTTPServer(("127.0.0.1", 0), QuietHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield http.client.HTTPConnection("127.0.0.1", httpd.server_address[1], timeout=5)
+    httpd.shutdown()
+    httpd.server_close()
+
+def get(conn, path):
+    conn.request("GET", path)
+    response = conn.getresponse()
+    return response, response.read()
+
+def test_keep_alive(server, tmp_path):
+    (tmp_path / "small.txt").write_bytes(b"small")
+    (tmp_path / "large.bin").write_bytes(os.urandom(QuietHandler.CACHEMAXITEM + 1))
+    for _ in range(2):
+        for name in ("small.txt", "large.bin"):
+            response, body = get(server, "/"+name)
+            assert body == (tmp_path / name).read_bytes()
+            assert int(response.getheader("Content-Length")) == len(body)
+
+def test_changed_after_fstat(server, tmp_path, monkeypatch):
+    # the file is rewritten between `fstat` and `read`
+    (tmp_path / "page.html").write_bytes(b"x" * 100)
+    fstat, calls = os.fstat, []
+    def staleFstat(fd):
+        st = fstat(fd)
+        calls.append(fd)
+        if len(calls) > 1: return st
+        return types.SimpleNamespace(st_mtime_ns=st.st_mtime_ns-1, st_mtime=st.st_mtime, st_size=50)
+    monkeypatch.setattr(pb.os, "fstat", staleFstat)
+    response, body = get(server, "/page.html")
+    assert len(body) == int(response.getheader("Content-Length")) == 100
+    monkeypatch.setattr(pb.os, "fstat", fstat)
+    response2, body2 = get(server, "/page.html")
+    assert body2 == body
+    assert response2.getheader("ETag") == response.getheader("ETag")
@@ -0,0 +1,29 @@
+"""
+html fragments spilled to a temporary file read back as they were written
+
+USAGE
+
+    python3 -m pytest tests
+"""
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from pagebuilder import SpillFile, SpilledFragment
+
+
+def test_roundtrip(monkeypatch):
+    monkeypatch.setattr(SpilledFragment, "CHUNKSIZE", 3)
+        # chunks that split the multi-byte characters
+    spill = SpillFile()
+    texts = ["<p>ä—ü</p>", "", "x" * 10]
+    fragments = [spill.add(text) for text in texts]
+    assert [str(fragment) for fragment in fragments] == texts
+    spill.close()
+
+def test_truncated():
+    spill = SpillFile()
+    fragment = spill.add("<p>lorem ipsum</p>")
+    spill.file.truncate(5)
+    assert str(fragment) == "<p>lo"
+    spill.close()
@@ -0,0 +1,90 @@
+"""
+merging with `Transformer` does not modify the dicts that are merged, and
+`LayeredDict` merges the same way as `contract`
+
+USAGE
+
+    python3 -m pytest tests
+"""
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from transformer import contract, LayeredDict
+from pagebuilder import PageBuilder, _removeIndent
+
+
+def test_contract():
+    result = contract([{'a': 1, 'd': {'x': 1}}, {'b': 2, 'd': {'y': 2}, 'a': None}])
+    assert result == {'b': 2, 'd': {'x': 1, 'y': 2}}
+
+def test_no_aliasing():
+    settings = {'meta': {'base': 1, 'nested': {'x': 1}}}
+    first = contract([settings, {'meta': {'field': 1, 'nested': {'y': 1}}}])
+    second = contract([settings, {'meta': {'other': 2}}])
+    assert settings == {'meta': {'base': 1, 'nested': {'x': 1}}}
+    assert first['meta'] == {'base': 1, 'nested': {'x': 1, 'y': 1}, 'field': 1}
+    assert second['meta'] == {'base': 1, 'nested': {'x': 1}, 'other': 2}
+    first['meta']['nested']['z'] = 1
+    assert second['meta']['nested'] == {'x': 1}
+
+def test_settings_meta_per_file():
+    # a file's :meta: fields used to be merged into the settings, and
+    # showed up in the meta data of all files converted after it
+    builder = PageBuilder(_settings=":meta:   basefield => base, field1 => value0\n")
+    _, meta1 = builder.parseMetaMarkdown(":meta:   field1 => value1, field2 => value2\n\ntext\n")
+    _, meta2 = builder.parseMetaMarkdown(":title:  Two\n\ntext\n")
+    assert meta1['meta'] == {'basefield': 'base', 'field1': 'value1', 'field2': 'value2'}
+    assert meta2['meta'] == {'basefield': 'base', 'field1': 'value0'}
+
+def test_layered_dict():
+    settings = {'a': 1, 'd': {'x': 1, 'n': {'p': 1}}, 'b': 2}
+    layered = LayeredDict([settings])
+    for below, top in [
+            ({}, {}),
+            ({'f': 0}, {'c': 3, 'a': None, 'd': {'y': 2, 'n': {'q': 2}}}),
+            ({'b': 0, 'f': 0}, {'d': 5, 'f': {'z': 1}}),
+        ]:
+        expected = contract([below, settings, top])
+        result = layered.over(top, below=below)
+        assert list(result.items()) == list(expected.items())
+        if isinstance(result['d'], dict): result['d']['n']['r'] = 3
+    assert settings == {'a': 1, 'd': {'x': 1, 'n': {'p': 1}}, 'b': 2}
+    assert list(layered) == list(settings) and layered['d'] == settings['d']
+
+def test_settings_filtered_once():
+    # the settings fields are filtered when the settings are read, and the
+    # meta data must be the same as when all fields are filtered per file
+    builder = PageBuilder(_settings=_removeIndent("""
+        :author:            Someone
+        :title|md:          Default *title*
+        :tags|ln:           one
+        :d|dct:             a => 1, b => 2
+        :bad|nosuch:        broken
+        :meta:              m0 => v0, m1 => v1
+        :plain:             plain value
+        """))
+    assert builder._settingsFilters.dynamic == ('d|dct', 'bad|nosuch', 'meta', '_analysis')
+    for text in [
+            "",
+            ":title|md:     Own **title**",
+            ":title:        plain title",
+            ":meta:         m1 => own, m9 => new",
+            ":bad|nosuch:   again\n:d|dct:     c => 3",
+            ":new|md:       *new*\n:author:    Other\n:plain|md:  _md_",
+        ]:
+        additionalMeta = {'_filename': "file.md", '_filenamebase': "file"}
+        processed = builder._parse(text+"\n\ntext\n")
+        expected = builder.applyFilters(contract([additionalMeta, builder._settings_meta, processed.meta]))
+        result = builder.applyFilters(builder._settings.over(processed.meta, below=additionalMeta),
+                        (additionalMeta, processed.meta))
+        assert list(result.items()) == list(expected.items())
+
+def test_inline_templates_bounded():
+    # every edit of a :_sectiontemplate: compiles a new template, and a
+    # long-running builder (--watch, --serve --live) must not keep them all
+    builder = PageBuilder()
+    for i in range(builder._INLINETEMPLATES + 10):
+        processed, meta = builder.parseMetaMarkdown(":_sectiontemplate:  <p>{} {{title}}</p>\n:title: T\n\ntext\n".format(i))
+        assert builder.renderMetaMarkdown(processed, meta).sectionHtml == "<p>{} T</p>".format(i)
+    assert len(builder._inlineTemplates) == builder._INLINETEMPLATES